@@ -1,27 +1,188 @@
 import pandas as pd
 import numpy as np
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import RegexpTokenizer
-from nltk.stem import WordNetLemmatizer
+import os
+import sys
+import glob
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from functools import partial, lru_cache
 import warnings
 warnings.simplefilter("ignore")
 import pickle
-from sklearn.feature_extraction.text import TfidfVectorizer
+# nltk is imported inside the functions that use it
 
 
-df1 = pd.read_csv('./raw_data/date_tweets_day_1.csv', index_col=0)
-df2 = pd.read_csv('./raw_data/date_tweets_day_2.csv', index_col=0)
-df3 = pd.read_csv('./raw_data/date_tweets_day_3.csv', index_col=0)
-df4 = pd.read_csv('./raw_data/date_tweets_day_4.csv', index_col=0)
-df5 = pd.read_csv('./raw_data/date_tweets_day_5.csv', index_col=0)
+module_dir = os.path.dirname(os.path.abspath(__file__))
+# the metrics recorder is shared by every function module, so it lives
+# in the repository root next to functions.py
+repo_dir = os.path.normpath(os.path.join(module_dir, '..', '..', '..'))
+if repo_dir not in sys.path:
+    sys.path.append(repo_dir)
+from stage_metrics import StageMetrics, metrics
+location_tweets_pattern = os.path.join(module_dir, 'raw_data', 'date_tweets_day_*.csv')
+building_classifier_dir = os.path.normpath(os.path.join(module_dir, '..', '..', '..', 'building_classifier'))
+model_bundle_path = os.path.join(building_classifier_dir, 'model_bundle.pickle')
 
-frames = [df1, df2, df3, df4, df5]
+class_labels = ['Anti Man-Made','Neutral','Man-Made','News']
 
-data = pd.concat(frames)
+def columnar_path(path):
+    '''
+    Function to get the Parquet counterpart of a csv path.
+    
+    Input
+    -----
+    path : str
+        Ex: './data/twitter_sentiment_data.csv'
+        
+    Output
+    ------
+    Same path with a .parquet extension
+    '''
+    return os.path.splitext(path)[0] + '.parquet'
 
-class_labels = ['Anti Man-Made','Neutral','Man-Made','News']
+def fresh_columnar_path(path):
+    '''
+    Function to get the Parquet copy of a csv when it is at least as new
+    as the csv, so a csv rewritten after it was converted is not read
+    from its stale copy.
+    
+    Input
+    -----
+    path : str
+        Location of the csv
+        
+    Output
+    ------
+    Path of the Parquet copy, None when there is none or it is older than
+    the csv
+    '''
+    columnar = columnar_path(path)
+    if not os.path.exists(columnar):
+        return None
+    if os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(columnar):
+        return None
+    return columnar
+
+def csv_column_positions(path, columns, **csv_kwargs):
+    '''
+    Function to find the positions of columns in a csv header for
+    pd.read_csv's usecols. Positions rather than names are used so an
+    unnamed index column read with index_col=0 is kept.
+    
+    Input
+    -----
+    path : str
+    columns : list (str)
+    
+    Optional Input
+    --------------
+    csv_kwargs :
+        The pd.read_csv arguments the csv will be read with
+        
+    Output
+    ------
+    List of column positions
+    '''
+    csv_kwargs.pop('chunksize', None)
+    header = pd.read_csv(path, nrows=0, **csv_kwargs)
+    positions = [i for i, name in enumerate(header.columns) if name in columns]
+    if csv_kwargs.get('index_col') == 0:
+        positions = [0] + [i + 1 for i in positions]
+    return positions
+
+def read_table(path, columns=None, **csv_kwargs):
+    '''
+    Function to read a dataset from its Parquet copy when one has been
+    written next to the csv since the csv last changed, and from the csv
+    otherwise. Only the
+    requested columns are parsed in either format.
+    
+    Input
+    -----
+    path : str
+        Location of the csv
+    
+    Optional Input
+    --------------
+    columns : list (str)
+        Columns to read, all columns when None
+        Ex: ['date', 'tweet']
+    csv_kwargs :
+        Passed to pd.read_csv when falling back to the csv
+        Ex: index_col=0, lineterminator='\\n'
+        
+    Output
+    ------
+    Dataframe with the requested columns
+    '''
+    columnar = fresh_columnar_path(path)
+    if columnar is not None:
+        # needs pyarrow or fastparquet, which only the converted datasets use
+        return pd.read_parquet(columnar, columns=columns)
+    
+    if columns is not None:
+        csv_kwargs['usecols'] = csv_column_positions(path, columns, **csv_kwargs)
+    frame = pd.read_csv(path, **csv_kwargs)
+    
+    return frame if columns is None else frame[list(columns)]
+
+def write_table(frame, path, dtypes=None):
+    '''
+    Function to write a dataset as Parquet next to its csv so read_table
+    picks it up.
+    
+    Input
+    -----
+    frame : Pandas Dataframe
+    path : str
+        Location of the csv the dataset came from
+    
+    Optional Input
+    --------------
+    dtypes : dict
+        Column to dtype mapping applied before writing
+        Ex: {'sentiment': 'int8', 'date': 'datetime64[ns]'}
+        
+    Output
+    ------
+    Path of the Parquet file
+    '''
+    if dtypes:
+        frame = frame.astype({column: dtype for column, dtype in dtypes.items() if column in frame})
+    columnar = columnar_path(path)
+    frame.to_parquet(columnar)
+    
+    return columnar
+
+@lru_cache(maxsize=None)
+def load_location_tweets(pattern=location_tweets_pattern):
+    '''
+    Function to read and combine the date_tweets_day csv files once per
+    process.
+    
+    Input
+    -----
+    None
+    
+    Optional Input
+    --------------
+    pattern : str
+        Glob pattern for the csv files, defaults to raw_data next to
+        this file
+        
+    Output
+    ------
+    Dataframe of every location tweet, shared between calls
+    '''
+    paths = sorted(glob.glob(pattern))
+    return pd.concat([read_table(path, index_col=0) for path in paths])
+
+def __getattr__(name):
+    # module.data still works, but the csv is only read on first access
+    if name == 'data':
+        return load_location_tweets()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 def tokenize_single(data, parameters):
     '''
@@ -41,6 +202,7 @@ def tokenize_single(data, parameters):
     ------
     Tokenized data
     '''   
+    from nltk.tokenize import RegexpTokenizer
     tokenizer = RegexpTokenizer(parameters)
     data = tokenizer.tokenize(data)
     return data
@@ -114,6 +276,212 @@ def states_list():
     return [ 'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI', 'ID','IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'MD', 'MA', 'MI', 'MN',
 'MS', 'MO', 'PA', 'RI','SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY']
 
+# full state names for the abbreviations in states_list, both are matched
+# by resolve_states
+state_names = {'AL': 'alabama', 'AK': 'alaska', 'AZ': 'arizona', 'AR': 'arkansas', 'CA': 'california',
+               'CO': 'colorado', 'CT': 'connecticut', 'DE': 'delaware', 'DC': 'district of columbia',
+               'FL': 'florida', 'GA': 'georgia', 'HI': 'hawaii', 'ID': 'idaho', 'IL': 'illinois',
+               'IN': 'indiana', 'IA': 'iowa', 'KS': 'kansas', 'KY': 'kentucky', 'LA': 'louisiana',
+               'ME': 'maine', 'MT': 'montana', 'NE': 'nebraska', 'NV': 'nevada', 'NH': 'new hampshire',
+               'NJ': 'new jersey', 'NM': 'new mexico', 'NY': 'new york', 'NC': 'north carolina',
+               'ND': 'north dakota', 'OH': 'ohio', 'OK': 'oklahoma', 'OR': 'oregon', 'MD': 'maryland',
+               'MA': 'massachusetts', 'MI': 'michigan', 'MN': 'minnesota', 'MS': 'mississippi',
+               'MO': 'missouri', 'PA': 'pennsylvania', 'RI': 'rhode island', 'SC': 'south carolina',
+               'SD': 'south dakota', 'TN': 'tennessee', 'TX': 'texas', 'UT': 'utah', 'VT': 'vermont',
+               'VA': 'virginia', 'WA': 'washington', 'WV': 'west virginia', 'WI': 'wisconsin', 'WY': 'wyoming'}
+
+# lowercased abbreviation or full name to abbreviation
+state_lookup = {name: abbreviation for abbreviation, name in state_names.items()}
+state_lookup.update({abbreviation.lower(): abbreviation for abbreviation in state_names})
+
+def state_alternation(names):
+    '''
+    Function to join state names into a regex alternation, longer names
+    first so 'west virginia' is not read as 'virginia'.
+    '''
+    return '(' + '|'.join(sorted(map(re.escape, names), key=len, reverse=True)) + ')'
+
+# 'washington' alone is as likely to mean the city as the state, so it is
+# only read as a state after a comma, as in 'seattle, washington'
+ambiguous_states = {'washington'}
+country = r'(?:usa|us|united states(?: of america)?)[\s.]*'
+
+# a state at the end of a location, matched three ways:
+#   after a comma, optionally followed by the country: 'austin, tx, usa'
+#   ending the location without a country: 'austin tx', 'texas'
+#   a full state name followed by the country: 'texas, usa'
+# a country suffix alone never makes an abbreviation match, so word-like
+# abbreviations in 'made in usa' or 'me, usa' are not read as states
+state_pattern = re.compile(r',\s*' + state_alternation(state_lookup) + r'[\s,.]*(?:' + country + r')?$'
+                           + r'|(?:^|\s)' + state_alternation(set(state_lookup) - ambiguous_states) + r'[\s,.]*$'
+                           + r'|(?:^|\s)' + state_alternation(set(state_names.values()) - ambiguous_states)
+                           + r'[\s,.]*' + country + '$')
+
+def resolve_states(locations):
+    '''
+    Function to find the US state of every profile location at once. Each
+    distinct location is matched against state_pattern a single time and
+    the result is shared by all rows with that location.
+    
+    Input
+    -----
+    locations : Pandas Series
+        Raw location column
+        Ex: data.location
+    
+    Optional Input
+    --------------
+    None
+        
+    Output
+    ------
+    Categorical Pandas Series of uppercase state abbreviations with the
+    same index as locations, NaN where no state was found
+    '''
+    # missing locations get a code of their own rather than -1, which would index the last unique
+    codes, uniques = pd.factorize(locations.astype(str).str.lower(), use_na_sentinel=False)
+    # one column per way of matching, at most one of them is filled
+    matched = pd.Series(uniques, dtype=object).str.extract(state_pattern).bfill(axis=1).iloc[:, 0]
+    
+    categories = states_list()
+    category_codes = {abbreviation: code for code, abbreviation in enumerate(categories)}
+    unique_codes = matched.map(state_lookup).map(category_codes).fillna(-1).astype(int).to_numpy()
+    
+    states = pd.Categorical.from_codes(unique_codes[codes], categories=categories)
+    return pd.Series(states, index=locations.index, name='state')
+
+
+class LemmatizationEngine:
+    '''
+    Class that loads the english stopwords and the WordNet lemmatizer
+    once per process and caches word to lemma lookups.
+
+    Input
+    -----
+    None
+
+    Optional Input
+    --------------
+    max_cache_size : int
+        Number of words kept in the lemma cache before the oldest
+        entries are evicted
+        Ex: 100000
+
+    Output
+    ------
+    Callable object returning lemmatized tweets as strings, with cache
+    hits and misses available as attributes
+    '''
+    def __init__(self, max_cache_size=100000):
+        self.max_cache_size = max_cache_size
+        self.letters = re.compile(r'[a-z]+')
+        self.stop_words = None
+        self.lemmatizer = None
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # NLTK resources are reloaded in the receiving process
+        state = self.__dict__.copy()
+        state['stop_words'] = None
+        state['lemmatizer'] = None
+        state['cache'] = {}
+        return state
+
+    def load(self):
+        '''
+        Function to load the stopwords and lemmatizer if they have not
+        been loaded yet in this process.
+        '''
+        if self.lemmatizer is None:
+            from nltk.corpus import stopwords
+            from nltk.stem import WordNetLemmatizer
+            self.stop_words = frozenset(stopwords.words('english'))
+            self.lemmatizer = WordNetLemmatizer()
+        return self
+
+    def cache_info(self):
+        '''
+        Function to report lemma cache usage.
+
+        Output
+        ------
+        Dictionary with hits, misses, current size and max size
+        '''
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.cache),
+                'max_size': self.max_cache_size}
+
+    def clear_cache(self):
+        '''
+        Function to empty the lemma cache and reset its counters.
+        '''
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def lemmatize_word(self, word):
+        '''
+        Function to lemmatize a single lowercase word.
+
+        Input
+        -----
+        word : str
+
+        Optional Input
+        --------------
+        None
+
+        Output
+        ------
+        Lemma of the word, or an empty string when the word is a
+        stopword or its lemma is two letters or fewer
+        '''
+        lemma = self.cache.get(word)
+        if lemma is not None:
+            self.hits += 1
+            return lemma
+        self.misses += 1
+        self.load()
+        if word in self.stop_words:
+            lemma = ''
+        else:
+            lemma = self.lemmatizer.lemmatize(word)
+            if len(lemma) <= 2:
+                lemma = ''
+        if len(self.cache) >= self.max_cache_size:
+            # dicts keep insertion order, so this drops the oldest entry
+            del self.cache[next(iter(self.cache))]
+        self.cache[word] = lemma
+        return lemma
+
+    def lemmatize(self, data):
+        '''
+        Function to lemmatize a single tweet.
+
+        Input
+        -----
+        data : str
+
+        Optional Input
+        --------------
+        None
+
+        Output
+        ------
+        String containing lemmatized tweet
+        '''
+        lemmas = (self.lemmatize_word(word) for word in self.letters.findall(data))
+        return ' '.join(lemma for lemma in lemmas if lemma)
+
+    def __call__(self, data):
+        return self.lemmatize(data)
+
+lemmatization_engine = LemmatizationEngine()
+
+@metrics.instrument('lemmatize_tweet')
 def lemmatize_tweet(data):
     '''
     Function to lemmatize tweets
@@ -130,16 +498,62 @@ def lemmatize_tweet(data):
     ------
     String containing lemmatized tweets
     '''   
-    stop_words = stopwords.words('english')
-    lemmatizer = WordNetLemmatizer()
-    lem_data = tokenize_single(data,r'[a-z]+')
-    lem_data = [lemmatizer.lemmatize(word) for word in lem_data if word not in stop_words]
-    lem_data = [word for word in lem_data if len(word) > 2]
-    lem_tweet = untokenize_single(lem_data)
-    lem_tweet = lem_tweet.strip()
-    
-    return lem_tweet
+    # stopwords, lemmatizer and word lemmas are shared across calls
+    return lemmatization_engine.lemmatize(data)
+
+class TweetNormalizer:
+    '''
+    Class that compiles the clean_tweet patterns once and applies the
+    same cleanup in two regex scans plus a letter filter.
+
+    Input
+    -----
+    None
+
+    Optional Input
+    --------------
+    None
 
+    Output
+    ------
+    Callable object returning cleaned tweets as strings, identical to
+    the chained clean_tweet steps
+    '''
+    def __init__(self):
+        # hashtags, mentions, hyperlinks and every other symbol become spaces
+        self.symbols = re.compile(r"(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)")
+        # after the first scan no '@', '.' or apostrophes remain, so the
+        # mention, 'pic.' and contraction passes can never match; only the
+        # link remainder and retweet markers are left to remove
+        self.links_retweets = re.compile(r'http\S+|RT')
+        self.letters = re.compile(r'[A-Za-z]+')
+
+    def normalize(self, data):
+        '''
+        Function to clean a single tweet.
+
+        Input
+        -----
+        data : str
+
+        Optional Input
+        --------------
+        None
+
+        Output
+        ------
+        Cleaned tweet as string
+        '''
+        data = self.symbols.sub(' ', data)
+        data = self.links_retweets.sub('', data)
+        return ' '.join(self.letters.findall(data)).lower()
+
+    def __call__(self, data):
+        return self.normalize(data)
+
+tweet_normalizer = TweetNormalizer()
+
+@metrics.instrument('clean_tweet')
 def clean_tweet(data):
     '''
     Function to clean tweets
@@ -156,25 +570,77 @@ def clean_tweet(data):
     ------
     Cleaned tweets as strings
     ''' 
-    #removing hashtags, hyperlinks, mentions
-    data = ' '.join(re.sub("(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)"," ",data).split())
-    # removing mentions
-    data = re.sub('(@[A-Za-z0-9]+)', '', data)
-    # removing links
-    data = re.sub(r'http\S+', '', data)
-    data = re.sub(r'pic\.\S+', '', data)
-    # convert contractions
-    data = decontracted(data)
-    # removing retweets
-    data = re.sub("RT",'',data).strip()
-    # making lowercase
-    data = data.lower()
-    
-    # filtering for just letters
-    data = tokenize_single(data, r'[a-zA-Z]+')
-    data = untokenize_single(data)
+    # removing hashtags, hyperlinks, mentions, contractions and retweets,
+    # lowercasing and filtering for just letters in one compiled pass
+    return tweet_normalizer.normalize(data)
+
+def preprocess_chunk(texts, clean=True):
+    '''
+    Function to clean and lemmatize a list of tweets in one process.
+
+    Input
+    -----
+    texts : list (str)
+
+    Optional Input
+    --------------
+    clean : bool
+        Whether to run clean_tweet before lemmatizing
+
+    Output
+    ------
+    List of cleaned and lemmatized tweets in the same order
+    '''
+    if clean:
+        return [lemmatization_engine.lemmatize(tweet_normalizer.normalize(str(x))) for x in texts]
+    return [lemmatization_engine.lemmatize(str(x)) for x in texts]
+
+def warm_up_worker():
+    '''
+    Function run once when a pool worker starts so stopwords and WordNet
+    are loaded per worker rather than per chunk.
+    '''
+    lemmatization_engine.load()
+    lemmatization_engine.lemmatizer.lemmatize('tweets')
+
+def preprocess_corpus(series, n_jobs=None, chunk_size=5000, clean=True):
+    '''
+    Function to clean and lemmatize a series of tweets across a process
+    pool while keeping row order.
+
+    Input
+    -----
+    series : Pandas Series (str)
+
+    Optional Input
+    --------------
+    n_jobs : int
+        Number of worker processes, None or -1 for every core and 1 to
+        stay in the current process
+    chunk_size : int
+        Number of tweets sent to a worker at a time
+        Ex: 5000
+    clean : bool
+        Whether to run clean_tweet before lemmatizing
+
+    Output
+    ------
+    Series of cleaned and lemmatized tweets with the input index
+    '''
+    texts = series.tolist()
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
     
-    return data
+    with metrics.stage('clean_and_lemmatize' if clean else 'lemmatize', rows=len(texts)):
+        if n_jobs == 1 or len(texts) <= chunk_size:
+            processed = preprocess_chunk(texts, clean=clean)
+        else:
+            chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks)), initializer=warm_up_worker) as pool:
+                # map yields results in submission order
+                processed = list(chain.from_iterable(pool.map(partial(preprocess_chunk, clean=clean), chunks)))
+    
+    return pd.Series(processed, index=series.index, name=series.name)
 
 def decontracted(phrase):
     '''
@@ -232,6 +698,7 @@ def untokenize_single(data):
     return new_data
 
 
+@metrics.instrument('tokenize')
 def tokenize(data, parameters):
     '''
     Function to tokenize any series of strings.
@@ -250,6 +717,7 @@ def tokenize(data, parameters):
     ------
     Tokenized data
     '''
+    from nltk.tokenize import RegexpTokenizer
     tokenizer = RegexpTokenizer(parameters)
     data.tweet = data.tweet.apply(lambda x: tokenizer.tokenize(x))
     return data.tweet
@@ -295,4 +763,116 @@ def lowercase(word_list):
     for x in word_list:
         x = x.lower()
         lowered.append(x)
-    return lowered
\ No newline at end of file
+    return lowered
+
+def predict_sentiment(texts, tfidf, model, batch_size=10000):
+    '''
+    Function to vectorize and predict tweets in row batches, passing the
+    sparse TF-IDF matrix straight to the classifier.
+    
+    Input
+    -----
+    texts : list (str) or Pandas Series (str)
+        Cleaned and lemmatized tweets
+    tfidf : fitted TfidfVectorizer
+    model : fitted classifier
+    
+    Optional Input
+    --------------
+    batch_size : int
+        Number of tweets transformed and predicted at a time
+        Ex: 10000
+        
+    Output
+    ------
+    Numpy array of predictions in the same order as texts
+    '''
+    texts = list(texts)
+    predictions = []
+    for start in range(0, len(texts), batch_size):
+        batch_texts = texts[start:start + batch_size]
+        with metrics.stage('vectorize', rows=len(batch_texts)):
+            # CSR matrix, no dense or per-column DataFrame copy
+            batch = tfidf.transform(batch_texts)
+        with metrics.stage('predict', rows=len(batch_texts)):
+            predictions.append(model.predict(batch))
+    
+    if not predictions:
+        return np.array([])
+    return np.concatenate(predictions)
+
+def predict_unique_sentiment(texts, tfidf, model, n_jobs=1, lemmatize=True):
+    '''
+    Function to score each distinct cleaned tweet once and broadcast the
+    predictions back to every row, so retweets and syndicated headlines
+    are only lemmatized, vectorized and predicted one time.
+    
+    Input
+    -----
+    texts : list (str) or Pandas Series (str)
+        Cleaned tweets
+    tfidf : fitted TfidfVectorizer
+    model : fitted classifier
+    
+    Optional Input
+    --------------
+    n_jobs : int
+        Number of processes used for lemmatizing
+    lemmatize : bool
+        Whether texts still need to go through lemmatize_tweet
+        
+    Output
+    ------
+    Numpy array of predictions in the same order as texts, and a
+    dictionary with rows, unique_texts and dedup_ratio (share of rows
+    that did not need scoring)
+    '''
+    # factorize hashes every text once and maps each row to its unique text
+    codes, uniques = pd.factorize(pd.Series(texts, dtype=object).astype(str))
+    unique_texts = pd.Series(uniques)
+    if lemmatize:
+        unique_texts = preprocess_corpus(unique_texts, n_jobs=n_jobs, clean=False)
+    unique_predictions = predict_sentiment(unique_texts, tfidf, model)
+    
+    rows = len(codes)
+    report = {'rows': rows,
+              'unique_texts': len(uniques),
+              'dedup_ratio': 1 - len(uniques) / rows if rows else 0.0}
+    
+    return unique_predictions[codes] if rows else unique_predictions, report
+
+# bump when the layout of the saved model bundle changes
+bundle_format_version = 1
+
+def load_model_bundle(path=model_bundle_path):
+    '''
+    Function to load the fitted TF-IDF vectorizer and classifier saved
+    by save_model_bundle.
+    
+    Input
+    -----
+    None
+    
+    Optional Input
+    --------------
+    path : str
+        Location of the bundle, defaults to building_classifier/model_bundle.pickle
+        
+    Output
+    ------
+    Dictionary with tfidf, model, format_version, sklearn_version and
+    created keys
+    '''
+    with open(path, 'rb') as f:
+        bundle = pickle.load(f)
+    
+    if bundle.get('format_version') != bundle_format_version:
+        raise ValueError('{} has bundle format version {}, expected {}'.format(
+            path, bundle.get('format_version'), bundle_format_version))
+    
+    import sklearn
+    if bundle['sklearn_version'] != sklearn.__version__:
+        warnings.warn('{} was saved with scikit-learn {} but {} is installed'.format(
+            path, bundle['sklearn_version'], sklearn.__version__))
+    
+    return bundle
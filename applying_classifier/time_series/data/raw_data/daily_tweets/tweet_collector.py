@@ -0,0 +1,347 @@
+import pandas as pd
+import os
+import csv
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+# twint is imported inside twint_search so the collector can run against
+# other backends without it installed
+
+module_dir = os.path.dirname(os.path.abspath(__file__))
+dates_since_path = os.path.join(module_dir, 'twitter_dates_since.csv')
+dates_until_path = os.path.join(module_dir, 'twitter_dates_until.csv')
+
+manifest_columns = ['since', 'until', 'shard', 'rows', 'status', 'error']
+
+def load_date_windows(since_path=dates_since_path, until_path=dates_until_path):
+    '''
+    Function to pair the since and until dates of every year into one
+    chronological list of daily search windows.
+
+    Input
+    -----
+    None
+
+    Optional Input
+    --------------
+    since_path : str
+    until_path : str
+        Csv files with one column of dates per year
+
+    Output
+    ------
+    List of (since, until) date strings
+        Ex: [('2010-01-01', '2010-01-02'), ...]
+    '''
+    dates_since = pd.read_csv(since_path, index_col=0)
+    dates_until = pd.read_csv(until_path, index_col=0)
+
+    windows = []
+    for year in dates_since.columns:
+        pairs = zip(dates_since[year], dates_until[year])
+        windows.extend((since, until) for since, until in pairs if pd.notnull(since) and pd.notnull(until))
+    return windows
+
+def shard_name(since, until):
+    '''
+    Function to name the shard file of a search window. The name matches
+    the tweets_*.csv pattern the time series functions read, and the dates
+    sort chronologically.
+    '''
+    return 'tweets_{}.csv'.format(until)
+
+def twint_search(search, limit, since, until):
+    '''
+    Function to run one twint search in a TwintBackend worker process.
+    twint clears its module level storage when a search starts, and each
+    process runs one search at a time, so searches never share results.
+
+    Input
+    -----
+    search : str
+    limit : int
+    since : str
+        None to leave Since unset
+    until : str
+
+    Output
+    ------
+    Dataframe with every column twint returns, id, date and tweet among
+    them
+    '''
+    import twint
+
+    c = twint.Config()
+    c.Search = search
+    c.Limit = limit
+    c.Pandas = True
+    c.Hide_output = True
+    if since is not None:
+        c.Since = since
+    c.Until = until
+
+    twint.run.Search(c)
+    tweets = twint.storage.panda.Tweets_df
+    # the whole frame is kept so readers can dedup on id and pick their
+    # own columns with read_table
+    return pd.DataFrame(columns=['id', 'date', 'tweet']) if tweets.empty else tweets.copy()
+
+class TwintBackend:
+    '''
+    Class that runs a twint search for one window, configured the same way
+    as the original collecting notebook. twint keeps its results in module
+    level storage and runs its own event loop, so each search runs in one
+    of a pool of worker processes rather than in the collector's threads.
+
+    Input
+    -----
+    None
+
+    Optional Input
+    --------------
+    search : str
+        Ex: 'climate%change'
+    limit : int
+        Maximum number of tweets per window
+    use_since : bool
+        The notebook only set Until, which returns the latest tweets
+        before that date, so Since is off by default
+    processes : int
+        Number of searches that can run at the same time, match it to
+        the max_workers of collect_tweets
+
+    Output
+    ------
+    Callable taking since and until and returning a dataframe with all
+    of twint's columns
+    '''
+    def __init__(self, search='climate%change', limit=1000, use_since=False, processes=4):
+        self.search = search
+        self.limit = limit
+        self.use_since = use_since
+        # spawned rather than forked, as the collector's threads are running
+        # when the first worker starts
+        self.pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+
+    def __call__(self, since, until):
+        future = self.pool.submit(twint_search, self.search, self.limit, since if self.use_since else None, until)
+        return future.result()
+
+    def close(self):
+        self.pool.shutdown()
+
+class FrameBackend:
+    '''
+    Class that serves tweets from a local dataframe instead of searching
+    twitter, for replaying collected data and for trying the collector
+    offline.
+
+    Input
+    -----
+    frame : Pandas Dataframe
+        Must contain date and tweet columns, other columns such as id are
+        kept
+
+    Optional Input
+    --------------
+    limit : int
+        Maximum number of tweets per window, latest first like twint
+
+    Output
+    ------
+    Callable taking since and until and returning the tweets dated in
+    that window
+    '''
+    def __init__(self, frame, limit=1000):
+        self.frame = frame.copy()
+        self.frame['date'] = pd.to_datetime(self.frame['date'])
+        self.frame = self.frame.sort_values('date', ascending=False)
+        self.limit = limit
+
+    def __call__(self, since, until):
+        in_window = (self.frame.date >= pd.Timestamp(since)) & (self.frame.date < pd.Timestamp(until))
+        return self.frame[in_window].head(self.limit)
+
+class RateLimiter:
+    '''
+    Class that spaces out calls shared between threads so that no more
+    than calls_per_second start each second.
+
+    Input
+    -----
+    calls_per_second : float
+        None or 0 turns the limit off
+
+    Optional Input
+    --------------
+    None
+
+    Output
+    ------
+    Object whose wait method blocks until the next call may start
+    '''
+    def __init__(self, calls_per_second):
+        self.interval = 1 / calls_per_second if calls_per_second else 0
+        self.next_call = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_call)
+            self.next_call = start + self.interval
+        time.sleep(start - now)
+
+def read_manifest(output_dir):
+    '''
+    Function to read the checkpoint manifest of a collection run.
+
+    Input
+    -----
+    output_dir : str
+
+    Optional Input
+    --------------
+    None
+
+    Output
+    ------
+    Dataframe with one row per attempted window, the latest attempt last
+    '''
+    path = os.path.join(output_dir, 'manifest.csv')
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=manifest_columns)
+    return pd.read_csv(path, dtype={'since': str, 'until': str})
+
+def completed_windows(output_dir):
+    '''
+    Function to find the windows whose shard was written and recorded as
+    done in the manifest.
+
+    Input
+    -----
+    output_dir : str
+
+    Optional Input
+    --------------
+    None
+
+    Output
+    ------
+    Set of (since, until) tuples
+    '''
+    manifest = read_manifest(output_dir)
+    done = manifest[manifest.status == 'done']
+    return {(since, until) for since, until, shard in zip(done.since, done.until, done.shard)
+            if os.path.exists(os.path.join(output_dir, shard))}
+
+def collect_window(since, until, backend, output_dir, limiter, retries=2):
+    '''
+    Function to search one window and write it to its own shard. The
+    shard is written to a temporary file first and renamed, so a crash
+    never leaves a partial shard behind.
+
+    Input
+    -----
+    since : str
+    until : str
+    backend : callable
+        Ex: TwintBackend()
+    output_dir : str
+    limiter : RateLimiter
+
+    Optional Input
+    --------------
+    retries : int
+        Extra attempts after a failed search or shard write, with
+        exponential backoff
+
+    Output
+    ------
+    Manifest row as a dictionary
+    '''
+    shard = shard_name(since, until)
+    error = ''
+    for attempt in range(retries + 1):
+        limiter.wait()
+        try:
+            tweets = backend(since, until)
+            path = os.path.join(output_dir, shard)
+            tweets.reset_index(drop=True).to_csv(path + '.tmp')
+            os.replace(path + '.tmp', path)
+        except Exception as e:
+            error = '{}: {}'.format(type(e).__name__, e)
+            time.sleep(2 ** attempt if attempt < retries else 0)
+            continue
+
+        return {'since': since, 'until': until, 'shard': shard, 'rows': len(tweets), 'status': 'done', 'error': ''}
+
+    return {'since': since, 'until': until, 'shard': shard, 'rows': 0, 'status': 'failed', 'error': error}
+
+def collect_tweets(backend, windows=None, output_dir=module_dir, max_workers=4, calls_per_second=1.0, retries=2, verbose=True):
+    '''
+    Function to collect every search window over a bounded thread pool.
+    Each finished window is appended to manifest.csv in output_dir, and
+    windows already recorded as done are skipped, so a crashed or
+    interrupted run picks up where it stopped when called again.
+
+    Input
+    -----
+    backend : callable
+        Takes since and until and returns a dataframe with at least date
+        and tweet columns
+        Ex: TwintBackend()
+
+    Optional Input
+    --------------
+    windows : list (tuple)
+        (since, until) pairs, defaults to load_date_windows()
+    output_dir : str
+        Folder for the shards and the manifest
+    max_workers : int
+        Number of windows searched at the same time, also bounded by the
+        backend, Ex: the processes of TwintBackend
+    calls_per_second : float
+        Maximum number of searches started per second across all workers
+    retries : int
+        Extra attempts for a window before it is recorded as failed
+    verbose : bool
+        Whether to print progress
+
+    Output
+    ------
+    Dataframe of the manifest rows written by this run
+    '''
+    if windows is None:
+        windows = load_date_windows()
+    done = completed_windows(output_dir)
+    pending = [window for window in windows if tuple(window) not in done]
+    if verbose:
+        print('{} windows, {} already collected, {} to go'.format(len(windows), len(windows) - len(pending), len(pending)))
+
+    manifest_path = os.path.join(output_dir, 'manifest.csv')
+    write_header = not os.path.exists(manifest_path)
+    limiter = RateLimiter(calls_per_second)
+    rows = []
+
+    with open(manifest_path, 'a', newline='') as f, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        writer = csv.DictWriter(f, fieldnames=manifest_columns)
+        if write_header:
+            writer.writeheader()
+        futures = [executor.submit(collect_window, since, until, backend, output_dir, limiter, retries)
+                   for since, until in pending]
+        # only this thread writes the manifest, one line per finished window
+        for future in as_completed(futures):
+            row = future.result()
+            writer.writerow(row)
+            f.flush()
+            rows.append(row)
+            if verbose and row['status'] == 'failed':
+                print('{} to {} failed: {}'.format(row['since'], row['until'], row['error']))
+
+    rows = pd.DataFrame(rows, columns=manifest_columns)
+    if verbose:
+        print('{} windows collected, {} failed'.format((rows.status == 'done').sum(), (rows.status == 'failed').sum()))
+    return rows
@@ -1,93 +1,325 @@
 import pandas as pd
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
 import pickle
 import os
-from nltk.corpus import stopwords
-from nltk.tokenize import RegexpTokenizer
-from nltk.tokenize import punkt
-import nltk
-from nltk import word_tokenize
-from wordcloud import WordCloud
-from nltk.stem import WordNetLemmatizer
-from textblob import TextBlob
+import sys
+import glob
+import itertools
 import string, re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from functools import partial, lru_cache
 
 import warnings
 warnings.simplefilter("ignore")
+# nltk, textblob, seaborn, matplotlib and statsmodels are imported inside
+# the functions that use them so importing this module only costs pandas and numpy
 
-df_1 = pd.read_csv('./raw_data/daily_tweets/tweets_2010_1.csv',index_col=0,lineterminator='\n')
-df_2 = pd.read_csv('./raw_data/daily_tweets/tweets_2010_2.csv',index_col=0,lineterminator='\n')
-df_3 = pd.read_csv('./raw_data/daily_tweets/tweets_2010_3.csv',index_col=0,lineterminator='\n')
-df_4 = pd.read_csv('./raw_data/daily_tweets/tweets_2010_4.csv',index_col=0,lineterminator='\n')
-df_5 = pd.read_csv('./raw_data/daily_tweets/tweets_2010_5.csv',index_col=0,lineterminator='\n')
-df_6 = pd.read_csv('./raw_data/daily_tweets/tweets_2011_1.csv',index_col=0,lineterminator='\n')
-df_7 = pd.read_csv('./raw_data/daily_tweets/tweets_2011_2.csv',index_col=0,lineterminator='\n')
-df_8 = pd.read_csv('./raw_data/daily_tweets/tweets_2011_3.csv',index_col=0,lineterminator='\n')
-df_9 = pd.read_csv('./raw_data/daily_tweets/tweets_2011_4.csv',index_col=0,lineterminator='\n')
-df_10 = pd.read_csv('./raw_data/daily_tweets/tweets_2011_5.csv',index_col=0,lineterminator='\n')
-df_11 = pd.read_csv('./raw_data/daily_tweets/tweets_2012_1.csv',index_col=0,lineterminator='\n')
-df_12 = pd.read_csv('./raw_data/daily_tweets/tweets_2012_2.csv',index_col=0,lineterminator='\n')
-df_13 = pd.read_csv('./raw_data/daily_tweets/tweets_2012_3.csv',index_col=0,lineterminator='\n')
-df_14 = pd.read_csv('./raw_data/daily_tweets/tweets_2012_4.csv',index_col=0,lineterminator='\n')
-df_15 = pd.read_csv('./raw_data/daily_tweets/tweets_2012_5.csv',index_col=0,lineterminator='\n')
-df_16 = pd.read_csv('./raw_data/daily_tweets/tweets_2013_1.csv',index_col=0,lineterminator='\n')
-df_17 = pd.read_csv('./raw_data/daily_tweets/tweets_2013_2.csv',index_col=0,lineterminator='\n')
-df_18 = pd.read_csv('./raw_data/daily_tweets/tweets_2013_3.csv',index_col=0,lineterminator='\n')
-df_19 = pd.read_csv('./raw_data/daily_tweets/tweets_2013_4.csv',index_col=0,lineterminator='\n')
-df_20 = pd.read_csv('./raw_data/daily_tweets/tweets_2013_5.csv',index_col=0,lineterminator='\n')
-df_21 = pd.read_csv('./raw_data/daily_tweets/tweets_2014_1.csv',index_col=0,lineterminator='\n')
-df_22 = pd.read_csv('./raw_data/daily_tweets/tweets_2014_2.csv',index_col=0,lineterminator='\n')
-df_23 = pd.read_csv('./raw_data/daily_tweets/tweets_2014_3.csv',index_col=0,lineterminator='\n')
-df_24 = pd.read_csv('./raw_data/daily_tweets/tweets_2014_4.csv',index_col=0,lineterminator='\n')
-df_25 = pd.read_csv('./raw_data/daily_tweets/tweets_2014_5.csv',index_col=0,lineterminator='\n')
-df_26 = pd.read_csv('./raw_data/daily_tweets/tweets_2015_1.csv',index_col=0,lineterminator='\n')
-df_27 = pd.read_csv('./raw_data/daily_tweets/tweets_2015_2.csv',index_col=0,lineterminator='\n')
-df_28 = pd.read_csv('./raw_data/daily_tweets/tweets_2015_3.csv',index_col=0,lineterminator='\n')
-df_29 = pd.read_csv('./raw_data/daily_tweets/tweets_2015_4.csv',index_col=0,lineterminator='\n')
-df_30 = pd.read_csv('./raw_data/daily_tweets/tweets_2015_5.csv',index_col=0,lineterminator='\n')
-df_31 = pd.read_csv('./raw_data/daily_tweets/tweets_2016_1.csv',index_col=0,lineterminator='\n')
-df_32 = pd.read_csv('./raw_data/daily_tweets/tweets_2016_2.csv',index_col=0,lineterminator='\n')
-df_33 = pd.read_csv('./raw_data/daily_tweets/tweets_2016_3.csv',index_col=0,lineterminator='\n')
-df_34 = pd.read_csv('./raw_data/daily_tweets/tweets_2016_4.csv',index_col=0,lineterminator='\n')
-df_35 = pd.read_csv('./raw_data/daily_tweets/tweets_2016_5.csv',index_col=0,lineterminator='\n')
-df_36 = pd.read_csv('./raw_data/daily_tweets/tweets_2017_1.csv',index_col=0,lineterminator='\n')
-df_37 = pd.read_csv('./raw_data/daily_tweets/tweets_2017_2.csv',index_col=0,lineterminator='\n')
-df_38 = pd.read_csv('./raw_data/daily_tweets/tweets_2017_3.csv',index_col=0,lineterminator='\n')
-df_39 = pd.read_csv('./raw_data/daily_tweets/tweets_2017_4.csv',index_col=0,lineterminator='\n')
-df_40 = pd.read_csv('./raw_data/daily_tweets/tweets_2017_5.csv',index_col=0,lineterminator='\n')
-df_41 = pd.read_csv('./raw_data/daily_tweets/tweets_2018_1.csv',index_col=0,lineterminator='\n')
-df_42 = pd.read_csv('./raw_data/daily_tweets/tweets_2018_2.csv',index_col=0,lineterminator='\n')
-df_43 = pd.read_csv('./raw_data/daily_tweets/tweets_2018_3.csv',index_col=0,lineterminator='\n')
-df_44 = pd.read_csv('./raw_data/daily_tweets/tweets_2018_4.csv',index_col=0,lineterminator='\n')
-df_45 = pd.read_csv('./raw_data/daily_tweets/tweets_2018_5.csv',index_col=0,lineterminator='\n')
-df_46 = pd.read_csv('./raw_data/daily_tweets/tweets_2019_1.csv',index_col=0,lineterminator='\n')
-df_47 = pd.read_csv('./raw_data/daily_tweets/tweets_2019_2.csv',index_col=0,lineterminator='\n')
-df_48 = pd.read_csv('./raw_data/daily_tweets/tweets_2019_3.csv',index_col=0,lineterminator='\n')
-df_49 = pd.read_csv('./raw_data/daily_tweets/tweets_2019_4.csv',index_col=0,lineterminator='\n')
-df_50 = pd.read_csv('./raw_data/daily_tweets/tweets_2019_5.csv',index_col=0,lineterminator='\n')
-df_51 = pd.read_csv('./raw_data/daily_tweets/tweets_2020_1.csv',index_col=0,lineterminator='\n')
-df_52 = pd.read_csv('./raw_data/daily_tweets/tweets_2020_2.csv',index_col=0,lineterminator='\n')
-df_53 = pd.read_csv('./raw_data/daily_tweets/tweets_2020_3.csv',index_col=0,lineterminator='\n')
-df_54 = pd.read_csv('./raw_data/daily_tweets/tweets_2020_4.csv',index_col=0,lineterminator='\n')
-df_55 = pd.read_csv('./raw_data/daily_tweets/tweets_2020_5.csv',index_col=0,lineterminator='\n')
-
-frames = [df_1, df_2, df_3, df_4, df_5, 
-          df_6, df_7, df_8, df_9, df_10, 
-          df_11, df_12, df_13, df_14, df_15, 
-          df_16, df_17, df_18, df_19, df_20, 
-          df_21, df_22, df_23, df_24, df_25, 
-          df_26, df_27, df_28, df_29, df_30, 
-          df_31, df_32, df_33, df_34, df_35, 
-          df_36, df_37, df_38, df_39, df_40, 
-          df_41, df_42, df_43, df_44, df_45, 
-          df_46, df_47, df_48, df_49, df_50, 
-          df_51, df_52, df_53, df_54, df_55]
-
-data = pd.concat(frames)
+module_dir = os.path.dirname(os.path.abspath(__file__))
+# the metrics recorder is shared by every function module, so it lives
+# in the repository root next to functions.py
+repo_dir = os.path.normpath(os.path.join(module_dir, '..', '..', '..'))
+if repo_dir not in sys.path:
+    sys.path.append(repo_dir)
+from stage_metrics import StageMetrics, metrics
+daily_tweets_pattern = os.path.join(module_dir, 'raw_data', 'daily_tweets', 'tweets_*.csv')
+building_classifier_dir = os.path.normpath(os.path.join(module_dir, '..', '..', '..', 'building_classifier'))
+model_bundle_path = os.path.join(building_classifier_dir, 'model_bundle.pickle')
+sarimax_cache_path = os.path.join(module_dir, 'sarimax_cache.pickle')
 
 class_labels = ['Anti Man-Made','Neutral','Man-Made','News']
 
+def columnar_path(path):
+    '''
+    Function to get the Parquet counterpart of a csv path.
+    
+    Input
+    -----
+    path : str
+        Ex: './data/twitter_sentiment_data.csv'
+        
+    Output
+    ------
+    Same path with a .parquet extension
+    '''
+    return os.path.splitext(path)[0] + '.parquet'
+
+def fresh_columnar_path(path):
+    '''
+    Function to get the Parquet copy of a csv when it is at least as new
+    as the csv, so a csv rewritten after it was converted is not read
+    from its stale copy.
+    
+    Input
+    -----
+    path : str
+        Location of the csv
+        
+    Output
+    ------
+    Path of the Parquet copy, None when there is none or it is older than
+    the csv
+    '''
+    columnar = columnar_path(path)
+    if not os.path.exists(columnar):
+        return None
+    if os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(columnar):
+        return None
+    return columnar
+
+def csv_column_positions(path, columns, **csv_kwargs):
+    '''
+    Function to find the positions of columns in a csv header for
+    pd.read_csv's usecols. Positions rather than names are used so an
+    unnamed index column read with index_col=0 is kept.
+    
+    Input
+    -----
+    path : str
+    columns : list (str)
+    
+    Optional Input
+    --------------
+    csv_kwargs :
+        The pd.read_csv arguments the csv will be read with
+        
+    Output
+    ------
+    List of column positions
+    '''
+    csv_kwargs.pop('chunksize', None)
+    header = pd.read_csv(path, nrows=0, **csv_kwargs)
+    positions = [i for i, name in enumerate(header.columns) if name in columns]
+    if csv_kwargs.get('index_col') == 0:
+        positions = [0] + [i + 1 for i in positions]
+    return positions
+
+def read_table(path, columns=None, **csv_kwargs):
+    '''
+    Function to read a dataset from its Parquet copy when one has been
+    written next to the csv since the csv last changed, and from the csv
+    otherwise. Only the
+    requested columns are parsed in either format.
+    
+    Input
+    -----
+    path : str
+        Location of the csv
+    
+    Optional Input
+    --------------
+    columns : list (str)
+        Columns to read, all columns when None
+        Ex: ['date', 'tweet']
+    csv_kwargs :
+        Passed to pd.read_csv when falling back to the csv
+        Ex: index_col=0, lineterminator='\\n'
+        
+    Output
+    ------
+    Dataframe with the requested columns
+    '''
+    columnar = fresh_columnar_path(path)
+    if columnar is not None:
+        # needs pyarrow or fastparquet, which only the converted datasets use
+        return pd.read_parquet(columnar, columns=columns)
+    
+    if columns is not None:
+        csv_kwargs['usecols'] = csv_column_positions(path, columns, **csv_kwargs)
+    frame = pd.read_csv(path, **csv_kwargs)
+    
+    return frame if columns is None else frame[list(columns)]
+
+def write_table(frame, path, dtypes=None):
+    '''
+    Function to write a dataset as Parquet next to its csv so read_table
+    picks it up.
+    
+    Input
+    -----
+    frame : Pandas Dataframe
+    path : str
+        Location of the csv the dataset came from
+    
+    Optional Input
+    --------------
+    dtypes : dict
+        Column to dtype mapping applied before writing
+        Ex: {'sentiment': 'int8', 'date': 'datetime64[ns]'}
+        
+    Output
+    ------
+    Path of the Parquet file
+    '''
+    if dtypes:
+        frame = frame.astype({column: dtype for column, dtype in dtypes.items() if column in frame})
+    columnar = columnar_path(path)
+    frame.to_parquet(columnar)
+    
+    return columnar
+
+@lru_cache(maxsize=None)
+def load_daily_tweets(pattern=None):
+    '''
+    Function to read and combine every daily tweet shard once per
+    process. Prefer iter_tweet_chunks when the full history does not
+    need to be in memory at once.
+    
+    Input
+    -----
+    None
+    
+    Optional Input
+    --------------
+    pattern : str
+        Glob pattern for the shard files, defaults to raw_data/daily_tweets
+        next to this file
+        
+    Output
+    ------
+    Dataframe of every collected tweet, shared between calls
+    '''
+    paths = find_tweet_shards(pattern or daily_tweets_pattern)
+    return pd.concat([read_table(path, index_col=0, lineterminator='\n') for path in paths])
+
+def __getattr__(name):
+    # module.data still works, but the csv is only read on first access
+    if name == 'data':
+        return load_daily_tweets()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+class LemmatizationEngine:
+    '''
+    Class that loads the english stopwords and the WordNet lemmatizer
+    once per process and caches word to lemma lookups.
+
+    Input
+    -----
+    None
+
+    Optional Input
+    --------------
+    max_cache_size : int
+        Number of words kept in the lemma cache before the oldest
+        entries are evicted
+        Ex: 100000
+
+    Output
+    ------
+    Callable object returning lemmatized tweets as strings, with cache
+    hits and misses available as attributes
+    '''
+    def __init__(self, max_cache_size=100000):
+        self.max_cache_size = max_cache_size
+        self.letters = re.compile(r'[a-z]+')
+        self.stop_words = None
+        self.lemmatizer = None
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # NLTK resources are reloaded in the receiving process
+        state = self.__dict__.copy()
+        state['stop_words'] = None
+        state['lemmatizer'] = None
+        state['cache'] = {}
+        return state
+
+    def load(self):
+        '''
+        Function to load the stopwords and lemmatizer if they have not
+        been loaded yet in this process.
+        '''
+        if self.lemmatizer is None:
+            from nltk.corpus import stopwords
+            from nltk.stem import WordNetLemmatizer
+            self.stop_words = frozenset(stopwords.words('english'))
+            self.lemmatizer = WordNetLemmatizer()
+        return self
+
+    def cache_info(self):
+        '''
+        Function to report lemma cache usage.
+
+        Output
+        ------
+        Dictionary with hits, misses, current size and max size
+        '''
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.cache),
+                'max_size': self.max_cache_size}
+
+    def clear_cache(self):
+        '''
+        Function to empty the lemma cache and reset its counters.
+        '''
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def lemmatize_word(self, word):
+        '''
+        Function to lemmatize a single lowercase word.
+
+        Input
+        -----
+        word : str
+
+        Optional Input
+        --------------
+        None
+
+        Output
+        ------
+        Lemma of the word, or an empty string when the word is a
+        stopword or its lemma is two letters or fewer
+        '''
+        lemma = self.cache.get(word)
+        if lemma is not None:
+            self.hits += 1
+            return lemma
+        self.misses += 1
+        self.load()
+        if word in self.stop_words:
+            lemma = ''
+        else:
+            lemma = self.lemmatizer.lemmatize(word)
+            if len(lemma) <= 2:
+                lemma = ''
+        if len(self.cache) >= self.max_cache_size:
+            # dicts keep insertion order, so this drops the oldest entry
+            del self.cache[next(iter(self.cache))]
+        self.cache[word] = lemma
+        return lemma
+
+    def lemmatize(self, data):
+        '''
+        Function to lemmatize a single tweet.
+
+        Input
+        -----
+        data : str
+
+        Optional Input
+        --------------
+        None
+
+        Output
+        ------
+        String containing lemmatized tweet
+        '''
+        lemmas = (self.lemmatize_word(word) for word in self.letters.findall(data))
+        return ' '.join(lemma for lemma in lemmas if lemma)
+
+    def __call__(self, data):
+        return self.lemmatize(data)
+
+lemmatization_engine = LemmatizationEngine()
+
+@metrics.instrument('lemmatize_tweet')
 def lemmatize_tweet(data):
     '''
     Function to lemmatize tweets
@@ -104,16 +336,62 @@ def lemmatize_tweet(data):
     ------
     String containing lemmatized tweets
     '''   
-    stop_words = stopwords.words('english')
-    lemmatizer = WordNetLemmatizer()
-    lem_data = tokenize_single(data,r'[a-z]+')
-    lem_data = [lemmatizer.lemmatize(word) for word in lem_data if word not in stop_words]
-    lem_data = [word for word in lem_data if len(word) > 2]
-    lem_tweet = untokenize_single(lem_data)
-    lem_tweet = lem_tweet.strip()
-    
-    return lem_tweet
+    # stopwords, lemmatizer and word lemmas are shared across calls
+    return lemmatization_engine.lemmatize(data)
+
+class TweetNormalizer:
+    '''
+    Class that compiles the clean_tweet patterns once and applies the
+    same cleanup in two regex scans plus a letter filter.
+
+    Input
+    -----
+    None
+
+    Optional Input
+    --------------
+    None
+
+    Output
+    ------
+    Callable object returning cleaned tweets as strings, identical to
+    the chained clean_tweet steps
+    '''
+    def __init__(self):
+        # hashtags, mentions, hyperlinks and every other symbol become spaces
+        self.symbols = re.compile(r"(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)")
+        # after the first scan no '@', '.' or apostrophes remain, so the
+        # mention, 'pic.' and contraction passes can never match; only the
+        # link remainder and retweet markers are left to remove
+        self.links_retweets = re.compile(r'http\S+|RT')
+        self.letters = re.compile(r'[A-Za-z]+')
+
+    def normalize(self, data):
+        '''
+        Function to clean a single tweet.
 
+        Input
+        -----
+        data : str
+
+        Optional Input
+        --------------
+        None
+
+        Output
+        ------
+        Cleaned tweet as string
+        '''
+        data = self.symbols.sub(' ', data)
+        data = self.links_retweets.sub('', data)
+        return ' '.join(self.letters.findall(data)).lower()
+
+    def __call__(self, data):
+        return self.normalize(data)
+
+tweet_normalizer = TweetNormalizer()
+
+@metrics.instrument('clean_tweet')
 def clean_tweet(data):
     '''
     Function to clean tweets
@@ -130,25 +408,77 @@ def clean_tweet(data):
     ------
     Cleaned tweets as strings
     ''' 
-    #removing hashtags, hyperlinks, mentions
-    data = ' '.join(re.sub("(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)"," ",data).split())
-    # removing mentions
-    data = re.sub('(@[A-Za-z0-9]+)', '', data)
-    # removing links
-    data = re.sub(r'http\S+', '', data)
-    data = re.sub(r'pic\.\S+', '', data)
-    # convert contractions
-    data = decontracted(data)
-    # removing retweets
-    data = re.sub("RT",'',data).strip()
-    # making lowercase
-    data = data.lower()
-    
-    # filtering for just letters
-    data = tokenize_single(data, r'[a-zA-Z]+')
-    data = untokenize_single(data)
+    # removing hashtags, hyperlinks, mentions, contractions and retweets,
+    # lowercasing and filtering for just letters in one compiled pass
+    return tweet_normalizer.normalize(data)
+
+def preprocess_chunk(texts, clean=True):
+    '''
+    Function to clean and lemmatize a list of tweets in one process.
+
+    Input
+    -----
+    texts : list (str)
+
+    Optional Input
+    --------------
+    clean : bool
+        Whether to run clean_tweet before lemmatizing
+
+    Output
+    ------
+    List of cleaned and lemmatized tweets in the same order
+    '''
+    if clean:
+        return [lemmatization_engine.lemmatize(tweet_normalizer.normalize(str(x))) for x in texts]
+    return [lemmatization_engine.lemmatize(str(x)) for x in texts]
+
+def warm_up_worker():
+    '''
+    Function run once when a pool worker starts so stopwords and WordNet
+    are loaded per worker rather than per chunk.
+    '''
+    lemmatization_engine.load()
+    lemmatization_engine.lemmatizer.lemmatize('tweets')
+
+def preprocess_corpus(series, n_jobs=None, chunk_size=5000, clean=True):
+    '''
+    Function to clean and lemmatize a series of tweets across a process
+    pool while keeping row order.
+
+    Input
+    -----
+    series : Pandas Series (str)
+
+    Optional Input
+    --------------
+    n_jobs : int
+        Number of worker processes, None or -1 for every core and 1 to
+        stay in the current process
+    chunk_size : int
+        Number of tweets sent to a worker at a time
+        Ex: 5000
+    clean : bool
+        Whether to run clean_tweet before lemmatizing
+
+    Output
+    ------
+    Series of cleaned and lemmatized tweets with the input index
+    '''
+    texts = series.tolist()
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
     
-    return data
+    with metrics.stage('clean_and_lemmatize' if clean else 'lemmatize', rows=len(texts)):
+        if n_jobs == 1 or len(texts) <= chunk_size:
+            processed = preprocess_chunk(texts, clean=clean)
+        else:
+            chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks)), initializer=warm_up_worker) as pool:
+                # map yields results in submission order
+                processed = list(chain.from_iterable(pool.map(partial(preprocess_chunk, clean=clean), chunks)))
+    
+    return pd.Series(processed, index=series.index, name=series.name)
 
 def decontracted(phrase):
     '''
@@ -223,10 +553,12 @@ def tokenize_single(data, parameters):
     ------
     Tokenized data
     '''   
+    from nltk.tokenize import RegexpTokenizer
     tokenizer = RegexpTokenizer(parameters)
     data = tokenizer.tokenize(data)
     return data
 
+@metrics.instrument('tokenize')
 def tokenize(data, parameters):
     '''
     Function to tokenize any series of strings.
@@ -245,6 +577,7 @@ def tokenize(data, parameters):
     ------
     Tokenized data
     '''
+    from nltk.tokenize import RegexpTokenizer
     tokenizer = RegexpTokenizer(parameters)
     data.tweet = data.tweet.apply(lambda x: tokenizer.tokenize(x))
     return data.tweet
@@ -269,6 +602,69 @@ def untokenize(data):
     data.tweet = data.tweet.apply(lambda x: x.replace(',',' '))
     return data.head()
 
+def class_statistics(data, columns, thresholds=None, class_column='sentiment'):
+    '''
+    Function to compute per-class statistics for any set of columns in a
+    single groupby pass, without building per-class copies of the data.
+    
+    Input
+    -----
+    data : Pandas Dataframe
+    columns : list (str)
+        Numeric columns to summarise
+    
+    Optional Input
+    --------------
+    thresholds : list or dict
+        Threshold scores applied to every column, or a dictionary of
+        column name to thresholds
+        Ex: [0, 0.5]
+    class_column : str
+        Column holding the class labels
+        
+    Output
+    ------
+    Tidy dataframe with class, column, statistic, threshold and value
+    columns. Statistics are:
+        mean - average value of the column
+        present_rate - share of rows where the column is above 0
+        below_rate - share of rows strictly below the threshold
+        above_rate - share of rows strictly above the threshold
+    '''
+    if thresholds is None:
+        thresholds = {}
+    elif not isinstance(thresholds, dict):
+        thresholds = {column: list(thresholds) for column in columns}
+    
+    # (column, statistic, threshold) for every derived series, keyed by position
+    specs = []
+    derived = {}
+    for column in columns:
+        values = data[column]
+        specs.append((column, 'mean', np.nan))
+        derived[len(derived)] = values
+        specs.append((column, 'present_rate', np.nan))
+        derived[len(derived)] = values > 0
+        for score in thresholds.get(column, []):
+            specs.append((column, 'below_rate', score))
+            derived[len(derived)] = values < score
+            specs.append((column, 'above_rate', score))
+            derived[len(derived)] = values > score
+    
+    # the mean of a boolean series is the share of rows where it holds
+    grouped = pd.DataFrame(derived).groupby(data[class_column].values).mean()
+    
+    rows = []
+    for position, (column, statistic, score) in enumerate(specs):
+        for label, value in grouped[position].items():
+            rows.append({'class': label,
+                         'column': column,
+                         'statistic': statistic,
+                         'threshold': score,
+                         'value': value})
+    
+    return pd.DataFrame(rows)
+
 def textblob_sentiment_analysis(data, column, score):
     '''
     Function to take in a column name and theshold score that first returns 
@@ -292,34 +688,17 @@ def textblob_sentiment_analysis(data, column, score):
     percentage that is above and the percentage that is below a the
     score input
     '''
-    # Create dataframe subsets
-    anti = data[data.sentiment == -1]
-    neutral = data[data.sentiment == 0]
-    man = data[data.sentiment == 1]
-    news = data[data.sentiment == 2]
-    
-    # Get percentages for below threshold
-    below_perc_anit = round((len(anti[anti[column] < score]) / len(anti)), 3)
-    below_perc_neutral = round((len(neutral[neutral[column] < score]) / len(neutral)), 3)
-    below_perc_man = round((len(man[man[column] < score]) / len(man)), 3)
-    below_perc_news = round((len(news[news[column] < score]) / len(news)), 3)
-    
-    # Get percentages for above threshold
-    above_perc_anit = round((len(anti[anti[column] > score]) / len(anti)), 3)
-    above_perc_neutral = round((len(neutral[neutral[column] > score]) / len(neutral)), 3)
-    above_perc_man = round((len(man[man[column] > score]) / len(man)), 3)
-    above_perc_news = round((len(news[news[column] > score]) / len(news)), 3)
+    # Every rate for every class in one groupby pass
+    stats = class_statistics(data, [column], thresholds=[score])
+    rates = stats.pivot(index='class', columns='statistic', values='value').round(3)
+    class_names = {-1: 'anti man-made', 0: 'neutral', 1: 'man-made', 2: 'news'}
     
     # Printing results
-    print('{}% of the anti man-made data is below the {} threshold of {}'.format(below_perc_anit, column, score))
-    print('{}% of the neutral data is below the {} threshold of {}'.format(below_perc_neutral, column, score))
-    print('{}% of the man-made data is below the {} threshold of {}'.format(below_perc_man, column, score))
-    print('{}% of the news data is below the {} threshold of {}'.format(below_perc_news, column, score))
+    for label, name in class_names.items():
+        print('{}% of the {} data is below the {} threshold of {}'.format(rates.below_rate[label], name, column, score))
     print('\n')
-    print('{}% of the anti man-made data is above the {} threshold of {}'.format(above_perc_anit, column, score))
-    print('{}% of the neutral data is above the {} threshold of {}'.format(above_perc_anit, column, score))
-    print('{}% of the man-made data is above the {} threshold of {}'.format(above_perc_anit, column, score))
-    print('{}% of the news data is above the {} threshold of {}'.format(above_perc_anit, column, score))
+    for label, name in class_names.items():
+        print('{}% of the {} data is above the {} threshold of {}'.format(rates.above_rate[label], name, column, score))
     
 
 def element_present_plot(column_name, element, title):
@@ -348,20 +727,15 @@ def element_present_plot(column_name, element, title):
     Plot showing the rate at which the element appears in each of
     the indvidual subsets
     '''  
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    data = load_daily_tweets()
     # Creating column column
-    data[column_name] = data.tweet.apply(lambda x: 1 if element in x else 0)
+    data[column_name] = data.tweet.str.contains(element, regex=False).astype(int)
 
-    # Resetting class subsets to include new column
-    anti = data[data.sentiment == -1]
-    neutral = data[data.sentiment == 0]
-    man = data[data.sentiment == 1]
-    news = data[data.sentiment == 2]
-
-    # Specifying y-values
-    element_frequencies = ((anti[column_name].sum() / len(anti)), 
-                           (neutral[column_name].sum() / len(neutral)),
-                           (man[column_name].sum() / len(man)),
-                           (news[column_name].sum() / len(news)))
+    # Specifying y-values from one groupby pass over the classes
+    stats = class_statistics(data, [column_name])
+    element_frequencies = tuple(stats[stats.statistic == 'present_rate'].value)
 
     # Building graph
     plt.figure(figsize=(20,10))
@@ -399,20 +773,15 @@ def element_count_plot(column_name, element, title):
     Plot showing the average number of times that element shows
     up per tweet for each subset
     '''  
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    data = load_daily_tweets()
     # Creating column column
-    data[column_name] = data.message.apply(lambda x: x.count(element))
-
-    # Resetting class subsets to include new column
-    anti = data[data.sentiment == -1]
-    neutral = data[data.sentiment == 0]
-    man = data[data.sentiment == 1]
-    news = data[data.sentiment == 2]
+    data[column_name] = data.message.str.count(re.escape(element))
 
-    # Specifying y-values
-    element_count_means = ((anti[column_name].mean()),
-                           (neutral[column_name].mean()),
-                           (man[column_name].mean()),
-                           (news[column_name].mean()))
+    # Specifying y-values from one groupby pass over the classes
+    stats = class_statistics(data, [column_name])
+    element_count_means = tuple(stats[stats.statistic == 'mean'].value)
 
     # Building graph
     plt.figure(figsize=(20,10))
@@ -450,10 +819,77 @@ def check_uppercase(data):
     return new_data
 
 
+def class_lexicon_stats(data, lexicons, text_column='message', class_column='sentiment'):
+    '''
+    Function to compute how often each lexicon shows up in each class
+    from a single document-term count matrix.
+    
+    Input
+    -----
+    data : Pandas Dataframe
+    lexicons : dict
+        Lexicon name to word list, multi-word entries allowed
+        Ex: {'News': load_news_words()}
+    
+    Optional Input
+    --------------
+    text_column : str
+        Column holding the tweets
+    class_column : str
+        Column holding the class labels
+        
+    Output
+    ------
+    Tidy dataframe with one row per class and lexicon:
+        tweets - number of tweets in the class
+        entries_present - lexicon entries that appear at least once in the class
+        occurrences - total lexicon matches in the class
+        rate - entries_present per tweet, the value word_associations_plot draws
+        occurrences_per_tweet - occurrences per tweet
+    The input dataframe is not modified.
+    '''
+    from scipy import sparse
+    from sklearn.feature_extraction.text import CountVectorizer
+    
+    letters = re.compile(r'[a-zA-Z]+')
+    
+    # entries are matched on whole lowercase words, the same way tweets are tokenized
+    entries = {name: sorted({' '.join(letters.findall(entry.lower())) for entry in words} - {''})
+               for name, words in lexicons.items()}
+    vocabulary = sorted(set(chain.from_iterable(entries.values())))
+    max_words = max([len(term.split()) for term in vocabulary] or [1])
+    vectorizer = CountVectorizer(vocabulary=vocabulary, token_pattern=r'[a-zA-Z]+',
+                                 ngram_range=(1, max_words))
+    term_counts = vectorizer.transform(data[text_column].astype(str))
+    
+    # summing document rows into class rows with a sparse one-hot product
+    classes, codes = np.unique(data[class_column].values, return_inverse=True)
+    one_hot = sparse.csr_matrix((np.ones(len(codes), dtype=term_counts.dtype), (codes, np.arange(len(codes)))),
+                                shape=(len(classes), len(codes)))
+    class_counts = (one_hot @ term_counts).toarray()
+    tweets = np.bincount(codes, minlength=len(classes))
+    
+    rows = []
+    for name, terms in entries.items():
+        columns = [vectorizer.vocabulary_[term] for term in terms]
+        lexicon_counts = class_counts[:, columns]
+        present = (lexicon_counts > 0).sum(axis=1)
+        occurrences = lexicon_counts.sum(axis=1)
+        for i, label in enumerate(classes):
+            rows.append({'class': label,
+                         'lexicon': name,
+                         'tweets': tweets[i],
+                         'entries_present': present[i],
+                         'occurrences': occurrences[i],
+                         'rate': present[i] / tweets[i],
+                         'occurrences_per_tweet': occurrences[i] / tweets[i]})
+    
+    return pd.DataFrame(rows)
+
 def word_associations_plot(load_association_list,title):
     '''
     Function to plot the rate at which words from one list
-    appear in another list
+    appear in each class, drawn from class_lexicon_stats
     
     Input
     -----
@@ -467,81 +903,15 @@ def word_associations_plot(load_association_list,title):
     ------
     Barplot of rate of words in given list
     '''   
-    # Create dataframe subsets
-    anti = data[data.sentiment == -1]
-    neutral = data[data.sentiment == 0]
-    man = data[data.sentiment == 1]
-    news = data[data.sentiment == 2]
-    
-    # Set word list equal to loaded list
-    word_list = load_association_list
-    
-    # Tokenize word_list
-    tokenizer = RegexpTokenizer(r'[a-zA-Z]+')
-    data.message = data.message.apply(lambda x: tokenizer.tokenize(x))
-    
-    # Lowercase word_list
-    data.message = data.message.apply(lambda x: lowercase(x))
-    
-    # Untokenizing data
-    data.message = data.message.apply(lambda x: ','.join(x))
-    data.message = data.message.apply(lambda x: x.replace(',',' '))
-    
-    # Combing all text for each class
-    anti_full_text = " ".join(tweet for tweet in anti.message)
-    neutral_full_text = " ".join(tweet for tweet in neutral.message)
-    man_full_text = " ".join(tweet for tweet in man.message)
-    news_full_text = " ".join(tweet for tweet in news.message)
-    
-    # Anti class counter
-    words_anti = 0
-    
-    # Counting
-    for word in word_list:
-        if word in anti_full_text:
-            words_anti += 1
-            
-    # Rate for anti class
-    anti_word_rate = (words_anti / len(anti))
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    data = load_daily_tweets()
+    
+    # Rate for every class from one document-term matrix, data is left as is
+    stats = class_lexicon_stats(data, {title: load_association_list})
     
-    # Neutral class counter
-    words_neutral = 0
-
-    # Counting
-    for word in word_list:
-        if word in neutral_full_text:
-            words_neutral += 1
-
-    # Rate for neutral class
-    neutral_word_rate = (words_neutral / len(neutral))
-
-    # Man class counter
-    words_man = 0
-
-    # Counting
-    for word in word_list:
-        if word in man_full_text:
-            words_man += 1
-
-    # Rate for man class
-    man_word_rate = (words_man / len(man))
-
-    # News class counter
-    words_news = 0
-
-    # Counting
-    for word in word_list:
-        if word in news_full_text:
-            words_news += 1
-
-    # Rate for news class
-    news_word_rate = (words_news / len(news))
-
     # Defining y-values
-    word_rate = (anti_word_rate,
-                 neutral_word_rate,
-                 man_word_rate,
-                 news_word_rate)
+    word_rate = tuple(stats.rate)
     
     # Plotting bar graph
     plt.figure(figsize=(20,10))
@@ -593,13 +963,71 @@ def word_association_features(data, word_association_list):
     ------
     Count of how many words from data appear in word_association_list
     '''
+    # hashing the list once instead of scanning it for every word
+    word_association_set = set(word_association_list)
     count = 0
     for word in data:
-        if word in word_association_list:
+        if word in word_association_set:
             count += 1
     
     return count
 
+# (column name, element, kind) for the string features, in output order
+string_features = [('hyperlink_present', 'http', 'present'),
+                   ('retweet_present', 'RT', 'present'),
+                   ('mention_present', '@', 'present'),
+                   ('mention_count', '@', 'count'),
+                   ('hashtag_present', '#', 'present'),
+                   ('hashtag_count', '#', 'count'),
+                   ('exclamation_point', '!', 'present'),
+                   ('question_mark', '?', 'present'),
+                   ('dollar_sign', '$', 'present'),
+                   ('percent_symbol', '%', 'present'),
+                   ('colon', ':', 'present'),
+                   ('semi_colon', ';', 'present')]
+
+def custom_feature_frame(data, column='tweet', textblob=True):
+    '''
+    Function to build the simple custom features for a dataframe with
+    vectorized string operations and a single TextBlob parse per row.
+    
+    Input
+    -----
+    data : Pandas Dataframe
+    
+    Optional Input
+    --------------
+    column : str
+        Name of the text column
+        Ex: 'tweet'
+    textblob : bool
+        Whether to compute the textblob polarity and subjectivity scores
+        
+    Output
+    ------
+    New DataFrame on the same index with the columns listed in
+    simple_custom_features, stored as float32 (scores), int16 (length
+    and counts) and int8 (binaries). The input is left untouched.
+    '''
+    text = data[column]
+    features = pd.DataFrame(index=data.index)
+    
+    if textblob:
+        # parsing every tweet once and reading both scores off the result
+        from textblob import TextBlob
+        sentiments = [TextBlob(x).sentiment for x in text]
+        features['textblob_polarity'] = np.array([s.polarity for s in sentiments], dtype=np.float32)
+        features['textblob_subjectivity'] = np.array([s.subjectivity for s in sentiments], dtype=np.float32)
+    
+    features['tweet_length'] = text.str.len().astype(np.int16)
+    for name, element, kind in string_features:
+        if kind == 'count':
+            features[name] = text.str.count(re.escape(element)).astype(np.int16)
+        else:
+            features[name] = text.str.contains(element, regex=False).astype(np.int8)
+    
+    return features
+
 def simple_custom_features(data):
     
     '''
@@ -632,21 +1060,9 @@ def simple_custom_features(data):
         colon - binary for presence of colon in message column value
         semi_colon - binary for presence of semi-colon in message column value
     '''
-    data['textblob_polarity'] = data['tweet'].apply(lambda x: TextBlob(x).sentiment.polarity)                                                        
-    data['textblob_subjectivity'] = data['tweet'].apply(lambda x: TextBlob(x).sentiment.subjectivity)
-    data['tweet_length'] = data['tweet'].apply(lambda x: len(x))
-    data['hyperlink_present'] = data['tweet'].apply(lambda x: 1 if 'http' in x else 0)
-    data['retweet_present'] = data['tweet'].apply(lambda x: 1 if 'RT' in x else 0)
-    data['mention_present'] = data['tweet'].apply(lambda x: 1 if '@' in x else 0)
-    data['mention_count'] = data['tweet'].apply(lambda x: x.count('@'))
-    data['hashtag_present'] = data['tweet'].apply(lambda x: 1 if '#' in x else 0)
-    data['hashtag_count'] = data['tweet'].apply(lambda x: x.count('#'))
-    data['exclamation_point'] = data['tweet'].apply(lambda x: 1 if '!' in x else 0)
-    data['question_mark'] = data['tweet'].apply(lambda x: 1 if '?' in x else 0)
-    data['dollar_sign'] = data['tweet'].apply(lambda x: 1 if '$' in x else 0)
-    data['percent_symbol'] = data['tweet'].apply(lambda x: 1 if '%' in x else 0)
-    data['colon'] = data['tweet'].apply(lambda x: 1 if ':' in x else 0)
-    data['semi_colon'] = data['tweet'].apply(lambda x: 1 if ';' in x else 0)
+    features = custom_feature_frame(data, column='tweet')
+    for name in features.columns:
+        data[name] = features[name]
     
     return data.head()
 
@@ -775,3 +1191,905 @@ def load_tier1_words():
     
     return tier_one_words_list
 
+
+def shard_sort_key(path):
+    '''
+    Function to order shard paths by the numbers in their file name so
+    tweets_2010_2 comes before tweets_2010_10.
+    '''
+    return [int(part) if part.isdigit() else part
+            for part in re.split(r'(\d+)', os.path.basename(path))]
+
+def find_tweet_shards(pattern=daily_tweets_pattern):
+    '''
+    Function to find the daily tweet shard files.
+    
+    Input
+    -----
+    None
+    
+    Optional Input
+    --------------
+    pattern : str
+        Glob pattern for the shard files
+        Ex: './raw_data/daily_tweets/tweets_*.csv'
+        
+    Output
+    ------
+    List of shard paths in chronological order
+    '''
+    return sorted(glob.glob(pattern), key=shard_sort_key)
+
+def iter_tweet_chunks(pattern=daily_tweets_pattern, chunk_size=50000):
+    '''
+    Function to stream the daily tweet shards in fixed-size chunks.
+    
+    Input
+    -----
+    None
+    
+    Optional Input
+    --------------
+    pattern : str
+        Glob pattern for the shard files
+    chunk_size : int
+        Maximum number of rows per chunk
+        Ex: 50000
+        
+    Output
+    ------
+    Generator of dataframes with date and tweet columns, and the twint id
+    column when the shard has one
+    '''
+    columns = ['id', 'date', 'tweet']
+    for path in find_tweet_shards(pattern):
+        columnar = fresh_columnar_path(path)
+        if columnar is not None:
+            import pyarrow.parquet as pq
+            shard = pq.ParquetFile(columnar)
+            present = [column for column in columns if column in shard.schema_arrow.names]
+            for batch in shard.iter_batches(batch_size=chunk_size, columns=present):
+                yield batch.to_pandas()
+        else:
+            csv_kwargs = {'index_col': 0, 'lineterminator': '\n'}
+            usecols = csv_column_positions(path, columns, **csv_kwargs)
+            for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunk_size, **csv_kwargs):
+                yield chunk[[column for column in columns if column in chunk]]
+
+def drop_seen_tweets(chunk, seen_ids):
+    '''
+    Function to drop tweets whose twint id was already counted, earlier in
+    the chunk or in an earlier chunk or shard. The overlapping search
+    windows can return the same tweet more than once, while separate
+    tweets with the same text are all kept.
+    
+    Input
+    -----
+    chunk : Pandas Dataframe
+        Output of iter_tweet_chunks
+    seen_ids : numpy array (int)
+        Sorted ids already counted
+    
+    Optional Input
+    --------------
+    None
+        
+    Output
+    ------
+    Chunk without the repeated tweets, and the sorted ids counted so far.
+    Chunks from shards without an id column are returned unchanged.
+    '''
+    if 'id' not in chunk:
+        return chunk, seen_ids
+    ids = chunk['id'].to_numpy(dtype=np.int64)
+    new = ~pd.Series(ids).duplicated().to_numpy() & ~np.isin(ids, seen_ids)
+    return chunk[new], np.union1d(seen_ids, ids)
+
+def score_tweet_chunk(chunk, tfidf, model, n_jobs=1):
+    '''
+    Function to clean, lemmatize, vectorize and predict a chunk of tweets.
+    
+    Input
+    -----
+    chunk : Pandas Dataframe
+        Must contain date and tweet columns
+    tfidf : fitted TfidfVectorizer
+    model : fitted classifier
+    
+    Optional Input
+    --------------
+    n_jobs : int
+        Number of processes used for cleaning and lemmatizing
+        
+    Output
+    ------
+    Dataframe with a day column and a sentiment column where news
+    predictions are counted as 0, matching the data_prep notebook.
+    Its attrs hold the rows and unique_texts counts from scoring each
+    distinct text once.
+    '''
+    chunk = chunk.copy()
+    with metrics.stage('clean', rows=len(chunk)):
+        chunk['tweet'] = chunk.tweet.astype(str).map(clean_tweet)
+    # lemmatizing and predicting each distinct text once, every row keeps
+    # its own prediction
+    predictions, report = predict_unique_sentiment(chunk.tweet, tfidf, model, n_jobs=n_jobs)
+    sentiment = np.where(predictions == 2, 0, predictions)
+    
+    scored = pd.DataFrame({'day': pd.to_datetime(chunk.date).dt.normalize().values,
+                           'sentiment': sentiment})
+    scored.attrs['rows'] = report['rows']
+    scored.attrs['unique_texts'] = report['unique_texts']
+    return scored
+
+def daily_sentiment_totals(tfidf, model, pattern=daily_tweets_pattern, chunk_size=50000, n_jobs=1, verbose=True,
+                           seen_ids=None, return_seen_ids=False):
+    '''
+    Function to stream every shard through the scoring steps while only
+    keeping per-day sentiment sums and counts. A tweet returned by more
+    than one search is counted once, by its twint id, so the totals do not
+    depend on chunk_size or on how the tweets are split into shards.
+    
+    Input
+    -----
+    tfidf : fitted TfidfVectorizer
+    model : fitted classifier
+    
+    Optional Input
+    --------------
+    pattern : str
+        Glob pattern for the shard files
+    chunk_size : int
+        Maximum number of rows held in memory at a time
+    n_jobs : int
+        Number of processes used for cleaning and lemmatizing
+    verbose : bool
+        Whether to print how much scoring work deduplication saved
+    seen_ids : numpy array (int)
+        Sorted ids of tweets already counted, Ex: by earlier ingests
+    return_seen_ids : bool
+        Whether to also return the sorted ids counted so far, including
+        the ones from this call
+        
+    Output
+    ------
+    Dataframe indexed by day with sum and count columns, and the ids when
+    return_seen_ids is True
+    '''
+    totals = pd.DataFrame(columns=['sum', 'count'], dtype=float)
+    seen_ids = np.array([], dtype=np.int64) if seen_ids is None else seen_ids
+    rows = unique_texts = 0
+    for chunk in metrics.iterate('read_shards', iter_tweet_chunks(pattern, chunk_size)):
+        chunk, seen_ids = drop_seen_tweets(chunk, seen_ids)
+        scored = score_tweet_chunk(chunk, tfidf, model, n_jobs=n_jobs)
+        rows += scored.attrs['rows']
+        unique_texts += scored.attrs['unique_texts']
+        with metrics.stage('aggregate_days', rows=len(scored)):
+            day_totals = scored.groupby('day').sentiment.agg(['sum', 'count'])
+            totals = totals.add(day_totals, fill_value=0)
+    
+    if verbose and rows:
+        print('Scored {} tweets from {} unique texts, dedup ratio {:.1%}'.format(
+            rows, unique_texts, 1 - unique_texts / rows))
+    
+    totals.index.name = 'date'
+    totals = totals.sort_index()
+    return (totals, seen_ids) if return_seen_ids else totals
+
+def daily_sentiment_from_totals(totals):
+    '''
+    Function to turn per-day sums and counts into the daily sentiment
+    series saved as time_series_daily_data.csv.
+    
+    Input
+    -----
+    totals : Pandas Dataframe
+        Output of daily_sentiment_totals
+    
+    Optional Input
+    --------------
+    None
+        
+    Output
+    ------
+    Dataframe indexed by day with a sentiment column scaled to 100,
+    forward filled over missing days and rounded to 2 decimal places
+    '''
+    with metrics.stage('resample_daily', rows=len(totals)):
+        daily_mean = pd.DataFrame({'sentiment': totals['sum'] / totals['count']})
+        daily_mean = daily_mean.asfreq('D').ffill()
+        daily_mean.sentiment = (daily_mean.sentiment.clip(lower=0) * 100).round(2)
+        daily_mean.index.name = 'date'
+    
+    return daily_mean
+
+# period used to group days for each rollup and whether the rollup is
+# labelled by the first or last day of the period, matching resample('W'),
+# resample('MS') and resample('Y') in the timeseries_analysis notebook
+rollup_periods = {'weekly': ('W', 'end'),
+                  'monthly': ('M', 'start'),
+                  'yearly': ('Y', 'end')}
+
+def csv_last_index(path):
+    '''
+    Function to read the index of the last row of a csv file indexed by
+    date without parsing the whole file.
+    
+    Input
+    -----
+    path : str
+    
+    Optional Input
+    --------------
+    None
+        
+    Output
+    ------
+    Timestamp of the last row, None when the file is missing, empty or
+    its last row is not a date
+    '''
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - 4096, 0))
+        lines = f.read().splitlines()
+    if len(lines) < 2:
+        return None
+    try:
+        return pd.Timestamp(lines[-1].split(b',')[0].decode())
+    except ValueError:
+        return None
+
+class SentimentRollupCube:
+    '''
+    Class that keeps the sum, sum of squares and count of the daily
+    sentiment series for every day, with running prefix sums of each.
+    Any date range, period mean or rolling window is then the difference
+    of two prefix sums, so the weekly, monthly and yearly series and
+    their rolling statistics are derived in time proportional to the
+    number of periods rather than the number of days.
+    
+    Input
+    -----
+    None
+    
+    Optional Input
+    --------------
+    daily : Pandas Dataframe or Series
+        Daily sentiment indexed by day
+        Ex: pd.read_csv('time_series_daily_data.csv', index_col=0, parse_dates=True)
+        
+    Output
+    ------
+    Cube with update, range_stats, resample and rolling methods
+    '''
+    def __init__(self, daily=None):
+        self.first_day = None
+        self.sums = np.zeros(0)
+        self.squares = np.zeros(0)
+        self.counts = np.zeros(0)
+        self.cum_sums = np.zeros(1)
+        self.cum_squares = np.zeros(1)
+        self.cum_counts = np.zeros(1)
+        if daily is not None:
+            self.update(daily)
+    
+    def __len__(self):
+        return len(self.sums)
+    
+    @property
+    def days(self):
+        '''
+        Daily index covered by the cube, including days without a value.
+        '''
+        if self.first_day is None:
+            return pd.DatetimeIndex([], name='date')
+        return pd.date_range(self.first_day, periods=len(self), freq='D', name='date')
+    
+    def positions(self, dates):
+        '''
+        Function to convert dates to day offsets from the first day.
+        '''
+        return np.asarray((pd.DatetimeIndex(dates).normalize() - self.first_day).days, dtype=np.int64)
+    
+    def update(self, daily):
+        '''
+        Function to set the value of new or changed days and refresh the
+        prefix sums from the earliest day that changed.
+        
+        Input
+        -----
+        daily : Pandas Dataframe or Series
+            Daily sentiment indexed by day, a dataframe must have a
+            sentiment column. Missing values clear a day.
+            
+        Output
+        ------
+        Earliest day whose prefix sums changed, None when daily is empty
+        '''
+        if isinstance(daily, pd.DataFrame):
+            daily = daily['sentiment']
+        if daily.empty:
+            return None
+        dates = pd.DatetimeIndex(daily.index).normalize()
+        
+        # the arrays are extended with empty days to cover the new dates
+        first, last = dates.min(), dates.max()
+        if self.first_day is None:
+            self.first_day = first
+        before = max((self.first_day - first).days, 0)
+        size = max((last - self.first_day).days + 1 + before, before + len(self))
+        after = size - before - len(self)
+        saved_days = len(self)
+        if before or after:
+            pad = lambda values: np.concatenate([np.zeros(before), values, np.zeros(after)])
+            self.sums, self.squares, self.counts = pad(self.sums), pad(self.squares), pad(self.counts)
+            self.first_day = min(first, self.first_day)
+        
+        values = daily.to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        positions = self.positions(dates)
+        self.sums[positions] = np.where(present, values, 0)
+        self.squares[positions] = np.where(present, values ** 2, 0)
+        self.counts[positions] = present
+        
+        # empty days appended before the new dates also need prefix sums
+        start = 0 if before else min(int(positions.min()), saved_days)
+        for values, cumulative in [(self.sums, 'cum_sums'), (self.squares, 'cum_squares'), (self.counts, 'cum_counts')]:
+            prefix = getattr(self, cumulative)
+            refreshed = np.concatenate([prefix[:start + 1], prefix[start] + np.cumsum(values[start:])])
+            setattr(self, cumulative, refreshed)
+        
+        return self.first_day + pd.Timedelta(days=start)
+    
+    def bounds(self, start=None, end=None):
+        '''
+        Function to convert an inclusive date range to prefix positions
+        clipped to the days in the cube.
+        '''
+        low = 0 if start is None else int(np.clip(self.positions([start])[0], 0, len(self)))
+        high = len(self) if end is None else int(np.clip(self.positions([end])[0] + 1, 0, len(self)))
+        return low, max(low, high)
+    
+    def range_stats(self, start=None, end=None):
+        '''
+        Function to summarize the daily sentiment between two dates in
+        constant time.
+        
+        Input
+        -----
+        None
+        
+        Optional Input
+        --------------
+        start : str or Timestamp
+        end : str or Timestamp
+            Inclusive, the whole history when left as None
+            Ex: '2016-01-01', '2016-12-31'
+            
+        Output
+        ------
+        Dictionary with count, sum, mean and std (sample standard
+        deviation, like pandas), mean and std are NaN without data
+        '''
+        if self.first_day is None:
+            return {'count': 0, 'sum': 0.0, 'mean': np.nan, 'std': np.nan}
+        low, high = self.bounds(start, end)
+        count = self.cum_counts[high] - self.cum_counts[low]
+        total = self.cum_sums[high] - self.cum_sums[low]
+        squares = self.cum_squares[high] - self.cum_squares[low]
+        mean = total / count if count else np.nan
+        std = np.sqrt(max(squares - total * mean, 0) / (count - 1)) if count > 1 else np.nan
+        return {'count': int(count), 'sum': total, 'mean': mean, 'std': std}
+    
+    def resample(self, name, start=None, end=None):
+        '''
+        Function to get the mean daily sentiment of every period, the same
+        series as resample('W'), resample('MS') or resample('Y') followed
+        by mean on the daily series.
+        
+        Input
+        -----
+        name : str
+            'daily' or a key of rollup_periods
+            Ex: 'weekly'
+        
+        Optional Input
+        --------------
+        start : str or Timestamp
+        end : str or Timestamp
+            Only the days in this inclusive range are used
+            
+        Output
+        ------
+        Dataframe with a sentiment column, indexed like the rollup csv files
+        '''
+        if self.first_day is None:
+            return pd.DataFrame({'sentiment': pd.Series(dtype=float)}, index=pd.DatetimeIndex([], name='date'))
+        low, high = self.bounds(start, end)
+        if name == 'daily':
+            sentiment = np.where(self.counts[low:high] > 0, self.sums[low:high], np.nan)
+            return pd.DataFrame({'sentiment': sentiment}, index=self.days[low:high])
+        
+        period, label = rollup_periods[name]
+        first = self.first_day + pd.Timedelta(days=low)
+        last = self.first_day + pd.Timedelta(days=max(high - 1, low))
+        periods = pd.period_range(first, last, freq=period)
+        begins = np.clip(self.positions(periods.start_time), low, high)
+        ends = np.clip(self.positions(periods.end_time) + 1, low, high)
+        counts = self.cum_counts[ends] - self.cum_counts[begins]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sentiment = np.where(counts > 0, (self.cum_sums[ends] - self.cum_sums[begins]) / counts, np.nan)
+        
+        index = periods.start_time if label == 'start' else periods.end_time.normalize()
+        # the frequency is kept on the index as resample does, which
+        # statsmodels uses to date forecasts
+        return pd.DataFrame({'sentiment': sentiment}, index=pd.DatetimeIndex(index, name='date', freq='infer'))
+    
+    def rolling(self, name, window, start=None, end=None):
+        '''
+        Function to get the rolling mean and standard deviation of the
+        daily series or of a rollup, like rolling(window).mean() and
+        rolling(window).std() on it.
+        
+        Input
+        -----
+        name : str
+            'daily' or a key of rollup_periods
+        window : int
+            Number of days or periods
+            Ex: 20
+        
+        Optional Input
+        --------------
+        start : str or Timestamp
+        end : str or Timestamp
+            
+        Output
+        ------
+        Dataframe with mean and std columns on the index of resample,
+        NaN until a full window of values is available
+        '''
+        series = self.resample(name, start, end)
+        values = series.sentiment.to_numpy()
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0)
+        
+        windowed = []
+        for column in [filled, filled ** 2, present.astype(float)]:
+            prefix = np.concatenate([[0], np.cumsum(column)])
+            sums = np.full(len(values), np.nan)
+            sums[window - 1:] = prefix[window:] - prefix[:len(prefix) - window]
+            windowed.append(sums)
+        total, squares, count = windowed
+        
+        full = count == window
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(full, total / window, np.nan)
+            variance = np.maximum(squares - total * mean, 0) / (window - 1)
+            std = np.where(full & (window > 1), np.sqrt(variance), np.nan)
+        return pd.DataFrame({'mean': mean, 'std': std}, index=series.index)
+    
+    def frame(self):
+        '''
+        Function to get the per-day cube with its prefix sums as a
+        dataframe, where adding later days only appends rows.
+        '''
+        return pd.DataFrame({'sum': self.sums, 'sum_sq': self.squares, 'count': self.counts,
+                             'cum_sum': self.cum_sums[1:], 'cum_sum_sq': self.cum_squares[1:],
+                             'cum_count': self.cum_counts[1:]}, index=self.days)
+
+class DailySentimentAggregator:
+    '''
+    Class that keeps per-day sentiment sums and counts on disk so new
+    tweet shards can be scored and folded into the daily, weekly, monthly
+    and yearly series without reprocessing the full history.
+
+    Input
+    -----
+    None
+
+    Optional Input
+    --------------
+    directory : str
+        Folder holding the state and output csv files
+        Ex: the folder of this file
+
+    Output
+    ------
+    Aggregator with totals, daily, cube, rollups, ingested and seen_ids
+    attributes
+    '''
+    def __init__(self, directory=module_dir):
+        self.totals_path = os.path.join(directory, 'daily_sentiment_totals.csv')
+        self.shards_path = os.path.join(directory, 'ingested_shards.csv')
+        self.ids_path = os.path.join(directory, 'ingested_tweet_ids.csv')
+        self.daily_path = os.path.join(directory, 'time_series_daily_data.csv')
+        self.cube_path = os.path.join(directory, 'sentiment_rollup_cube.csv')
+        self.rollup_paths = {name: os.path.join(directory, 'time_series_{}_data.csv'.format(name))
+                             for name in rollup_periods}
+        self.load()
+
+    def load(self):
+        '''
+        Function to read the saved state, starting empty when there is none.
+        '''
+        self.totals = pd.DataFrame(columns=['sum', 'count'], dtype=float)
+        self.totals.index = pd.DatetimeIndex([], name='date')
+        self.ingested = pd.DataFrame(columns=['shard', 'rows'])
+        self.seen_ids = np.array([], dtype=np.int64)
+        if os.path.exists(self.totals_path):
+            self.totals = pd.read_csv(self.totals_path, index_col=0, parse_dates=True)
+        if os.path.exists(self.shards_path):
+            self.ingested = pd.read_csv(self.shards_path)
+        if os.path.exists(self.ids_path):
+            self.seen_ids = np.unique(pd.read_csv(self.ids_path).id.to_numpy(dtype=np.int64))
+
+        # the daily and rollup series are only trusted when they were
+        # written from the saved totals
+        self.daily = daily_sentiment_from_totals(self.totals)
+        self.cube = SentimentRollupCube(self.daily)
+        self.rollups = {name: self.rollup_range(name, self.daily.index.min())
+                        for name in rollup_periods}
+
+    def pending_shards(self, pattern=daily_tweets_pattern):
+        '''
+        Function to list shards matching pattern that have not been ingested.
+        '''
+        done = set(self.ingested.shard)
+        return [path for path in find_tweet_shards(pattern) if os.path.basename(path) not in done]
+
+    def ingest(self, tfidf, model, pattern=daily_tweets_pattern, chunk_size=50000, n_jobs=1):
+        '''
+        Function to score every pending shard and fold it into the saved
+        series. A shard is recorded as ingested only after its totals and
+        tweet ids are saved, so an interrupted run can be started again,
+        and a tweet already counted from an earlier shard is skipped.
+        
+        Input
+        -----
+        tfidf : fitted TfidfVectorizer
+        model : fitted classifier
+        
+        Optional Input
+        --------------
+        pattern : str
+            Glob pattern for the shard files
+        chunk_size : int
+            Maximum number of rows held in memory at a time
+        n_jobs : int
+            Number of processes used for lemmatizing
+            
+        Output
+        ------
+        List of shard paths that were ingested
+        '''
+        shards = self.pending_shards(pattern)
+        for path in shards:
+            shard_totals, seen_ids = daily_sentiment_totals(tfidf, model, pattern=glob.escape(path),
+                                                            chunk_size=chunk_size, n_jobs=n_jobs, verbose=False,
+                                                            seen_ids=self.seen_ids, return_seen_ids=True)
+            self.add_totals(shard_totals)
+            new_ids = np.setdiff1d(seen_ids, self.seen_ids, assume_unique=True)
+            pd.DataFrame({'id': new_ids}).to_csv(self.ids_path, mode='a', header=not os.path.exists(self.ids_path),
+                                                 index=False)
+            self.seen_ids = seen_ids
+            self.ingested.loc[len(self.ingested)] = [os.path.basename(path), int(shard_totals['count'].sum())]
+            self.ingested.to_csv(self.shards_path, index=False)
+        return shards
+
+    def add_totals(self, new_totals):
+        '''
+        Function to add per-day sums and counts and refresh only the days
+        and rollup periods they touch.
+        
+        Input
+        -----
+        new_totals : Pandas Dataframe
+            Output of daily_sentiment_totals
+            
+        Output
+        ------
+        None, the state and output csv files are updated
+        '''
+        if new_totals.empty:
+            return
+        start = new_totals.index.min()
+        saved_end = self.totals.index.max() if len(self.totals) else None
+        
+        self.totals = self.totals.add(new_totals, fill_value=0).sort_index()
+        self.totals.index.name = 'date'
+        self.write_from(self.totals, self.totals_path, start, saved_end)
+        
+        # ffill means a changed day can move every later day up to the
+        # next day with tweets, and days in a gap before start are new when
+        # they come after the saved series, so the refresh reads from the
+        # last day with data before start and runs to the end of the history
+        earlier = self.totals.index[self.totals.index < start]
+        window_start = earlier[-1] if len(earlier) else start
+        daily_end = self.daily.index.max() if len(self.daily) else None
+        if daily_end is not None:
+            start = min(start, daily_end + pd.Timedelta(days=1))
+        refreshed = daily_sentiment_from_totals(self.totals.loc[window_start:]).loc[start:]
+        self.daily = pd.concat([self.daily[self.daily.index < start], refreshed])
+        self.write_from(self.daily, self.daily_path, start, daily_end)
+        self.cube.update(refreshed)
+        self.write_from(self.cube.frame(), self.cube_path, start, daily_end)
+        
+        for name in rollup_periods:
+            rollup = self.rollups[name]
+            refreshed = self.rollup_range(name, start)
+            period_end = rollup.index.max() if len(rollup) else None
+            self.rollups[name] = pd.concat([rollup[rollup.index < refreshed.index.min()], refreshed])
+            self.write_from(self.rollups[name], self.rollup_paths[name], refreshed.index.min(), period_end)
+
+    def rollup_range(self, name, start):
+        '''
+        Function to compute one rollup from the period containing start to
+        the end of the daily series.
+        '''
+        if pd.isnull(start):
+            return self.cube.resample(name)
+        return self.cube.resample(name, pd.Period(start, rollup_periods[name][0]).start_time)
+
+    def write_from(self, frame, path, start, saved_end):
+        '''
+        Function to append the rows from start when they all come after
+        the rows already saved, and to rewrite the file otherwise. The
+        file is only appended to when it still ends at saved_end, so a
+        file rewritten by anything else is replaced rather than extended.
+        '''
+        with metrics.stage('write_csv') as stage:
+            if saved_end is not None and start > saved_end and csv_last_index(path) == saved_end:
+                rows = frame.loc[start:]
+                rows.to_csv(path, mode='a', header=False)
+            else:
+                rows = frame
+                rows.to_csv(path)
+            stage['rows'] = len(rows)
+
+def predict_sentiment(texts, tfidf, model, batch_size=10000):
+    '''
+    Function to vectorize and predict tweets in row batches, passing the
+    sparse TF-IDF matrix straight to the classifier.
+    
+    Input
+    -----
+    texts : list (str) or Pandas Series (str)
+        Cleaned and lemmatized tweets
+    tfidf : fitted TfidfVectorizer
+    model : fitted classifier
+    
+    Optional Input
+    --------------
+    batch_size : int
+        Number of tweets transformed and predicted at a time
+        Ex: 10000
+        
+    Output
+    ------
+    Numpy array of predictions in the same order as texts
+    '''
+    texts = list(texts)
+    predictions = []
+    for start in range(0, len(texts), batch_size):
+        batch_texts = texts[start:start + batch_size]
+        with metrics.stage('vectorize', rows=len(batch_texts)):
+            # CSR matrix, no dense or per-column DataFrame copy
+            batch = tfidf.transform(batch_texts)
+        with metrics.stage('predict', rows=len(batch_texts)):
+            predictions.append(model.predict(batch))
+    
+    if not predictions:
+        return np.array([])
+    return np.concatenate(predictions)
+
+def predict_unique_sentiment(texts, tfidf, model, n_jobs=1, lemmatize=True):
+    '''
+    Function to score each distinct cleaned tweet once and broadcast the
+    predictions back to every row, so retweets and syndicated headlines
+    are only lemmatized, vectorized and predicted one time.
+    
+    Input
+    -----
+    texts : list (str) or Pandas Series (str)
+        Cleaned tweets
+    tfidf : fitted TfidfVectorizer
+    model : fitted classifier
+    
+    Optional Input
+    --------------
+    n_jobs : int
+        Number of processes used for lemmatizing
+    lemmatize : bool
+        Whether texts still need to go through lemmatize_tweet
+        
+    Output
+    ------
+    Numpy array of predictions in the same order as texts, and a
+    dictionary with rows, unique_texts and dedup_ratio (share of rows
+    that did not need scoring)
+    '''
+    # factorize hashes every text once and maps each row to its unique text
+    codes, uniques = pd.factorize(pd.Series(texts, dtype=object).astype(str))
+    unique_texts = pd.Series(uniques)
+    if lemmatize:
+        unique_texts = preprocess_corpus(unique_texts, n_jobs=n_jobs, clean=False)
+    unique_predictions = predict_sentiment(unique_texts, tfidf, model)
+    
+    rows = len(codes)
+    report = {'rows': rows,
+              'unique_texts': len(uniques),
+              'dedup_ratio': 1 - len(uniques) / rows if rows else 0.0}
+    
+    return unique_predictions[codes] if rows else unique_predictions, report
+
+# bump when the layout of the saved model bundle changes
+bundle_format_version = 1
+
+def load_model_bundle(path=model_bundle_path):
+    '''
+    Function to load the fitted TF-IDF vectorizer and classifier saved
+    by save_model_bundle.
+    
+    Input
+    -----
+    None
+    
+    Optional Input
+    --------------
+    path : str
+        Location of the bundle, defaults to building_classifier/model_bundle.pickle
+        
+    Output
+    ------
+    Dictionary with tfidf, model, format_version, sklearn_version and
+    created keys
+    '''
+    with open(path, 'rb') as f:
+        bundle = pickle.load(f)
+    
+    if bundle.get('format_version') != bundle_format_version:
+        raise ValueError('{} has bundle format version {}, expected {}'.format(
+            path, bundle.get('format_version'), bundle_format_version))
+    
+    import sklearn
+    if bundle['sklearn_version'] != sklearn.__version__:
+        warnings.warn('{} was saved with scikit-learn {} but {} is installed'.format(
+            path, bundle['sklearn_version'], sklearn.__version__))
+    
+    return bundle
+
+def series_key(series):
+    '''
+    Function to hash the index and values of a series or dataframe so
+    fits of exactly the same data can be found in the SARIMAX cache.
+    '''
+    import hashlib
+    
+    row_hashes = pd.util.hash_pandas_object(series, index=True).values
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+def fit_sarimax_candidate(series, order, seasonal_order, start_params=None):
+    '''
+    Function to fit one SARIMAX candidate the way the timeseries_analysis
+    notebook does, without raising when the fit fails.
+    
+    Input
+    -----
+    series : Pandas Series or Dataframe
+    order : tuple
+        Ex: (0, 1, 1)
+    seasonal_order : tuple
+        Ex: (0, 1, 1, 12)
+    
+    Optional Input
+    --------------
+    start_params : numpy array
+        Parameters to start the optimizer from, such as the fit of the
+        same order on the series without its latest months
+        
+    Output
+    ------
+    Dictionary with order, seasonal_order, aic, converged, params and error
+    '''
+    import statsmodels.api as sm
+    
+    result = {'order': order, 'seasonal_order': seasonal_order, 'aic': np.nan,
+              'converged': False, 'params': None, 'error': ''}
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            model = sm.tsa.statespace.SARIMAX(series,
+                                              order=order,
+                                              seasonal_order=seasonal_order,
+                                              enforce_stationarity=False,
+                                              enforce_invertibility=False)
+            fitted = model.fit(start_params=start_params, disp=False)
+    except Exception as e:
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+        return result
+    
+    result['aic'] = fitted.aic
+    result['converged'] = bool(fitted.mle_retvals.get('converged', True)) and np.isfinite(fitted.aic)
+    result['params'] = np.asarray(fitted.params)
+    return result
+
+def load_sarimax_cache(path):
+    '''
+    Function to read the SARIMAX fit cache, empty when there is none.
+    '''
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def sarimax_order_search(series, orders, seasonal_orders, n_jobs=None, cache_path=sarimax_cache_path, warm_start_periods=12):
+    '''
+    Function to fit every order and seasonal order pair across a process
+    pool and rank them by AIC. Fits are cached by series hash and order,
+    so rerunning on the same data fits nothing. When the series has grown
+    since the last run, the cached fit of the same order on the shorter
+    series is used as the optimizer's starting point.
+    
+    Input
+    -----
+    series : Pandas Series or Dataframe
+        Ex: monthly_mean
+    orders : list (tuple)
+        Ex: pdq
+    seasonal_orders : list (tuple)
+        Ex: seasonal_pdq
+    
+    Optional Input
+    --------------
+    n_jobs : int
+        Number of processes, defaults to the number of CPUs
+    cache_path : str
+        Location of the pickled cache, None to turn caching off
+    warm_start_periods : int
+        How many of the latest periods may have been added since a cached
+        fit for it to be used as a starting point
+        
+    Output
+    ------
+    Dataframe with one row per candidate sorted by AIC, candidates that
+    failed or did not converge are last with converged False
+    '''
+    cache = load_sarimax_cache(cache_path) if cache_path else {}
+    key = series_key(series)
+    # keys of the series without its latest periods, newest first
+    prefix_keys = [series_key(series.iloc[:-k]) for k in range(1, min(warm_start_periods, len(series) - 1) + 1)]
+    
+    results = []
+    to_fit = []
+    for order, seasonal_order in itertools.product(orders, seasonal_orders):
+        order, seasonal_order = tuple(order), tuple(seasonal_order)
+        cached = cache.get((key, order, seasonal_order))
+        if cached is not None:
+            results.append(dict(cached, cached=True))
+            continue
+        start_params = None
+        for prefix_key in prefix_keys:
+            previous = cache.get((prefix_key, order, seasonal_order))
+            if previous is not None and previous['converged']:
+                start_params = previous['params']
+                break
+        to_fit.append((order, seasonal_order, start_params))
+    
+    if to_fit:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            fits = executor.map(fit_sarimax_candidate, *zip(*[(series, order, seasonal_order, start_params)
+                                                              for order, seasonal_order, start_params in to_fit]))
+            for fit in fits:
+                cache[(key, fit['order'], fit['seasonal_order'])] = fit
+                results.append(dict(fit, cached=False))
+        if cache_path:
+            with open(cache_path, 'wb') as f:
+                pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    results = pd.DataFrame(results, columns=['order', 'seasonal_order', 'aic', 'converged', 'cached', 'error', 'params'])
+    results = results.sort_values(['converged', 'aic'], ascending=[False, True]).reset_index(drop=True)
+    
+    return results
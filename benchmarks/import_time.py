@@ -0,0 +1,80 @@
+'''
+Benchmark for how long it takes to import the shared function modules.
+
+Each import runs in a fresh interpreter started from a temporary working
+directory, so no data files are reachable through relative paths and the
+module cache is cold every time.
+
+Usage
+-----
+python benchmarks/import_time.py
+python benchmarks/import_time.py --module building_classifier_functions --repeat 10
+'''
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# directory that has to be on sys.path for each module
+module_dirs = {'functions': repo_dir,
+               'building_classifier_functions': os.path.join(repo_dir, 'building_classifier'),
+               'location_functions': os.path.join(repo_dir, 'applying_classifier', 'location', 'data'),
+               'time_series_functions': os.path.join(repo_dir, 'applying_classifier', 'time_series', 'data')}
+
+timer_code = '''
+import sys, time
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+'''
+
+def time_import(module, repeat=5):
+    '''
+    Function to time a cold import of a module.
+
+    Input
+    -----
+    module : str
+        Ex: 'functions'
+
+    Optional Input
+    --------------
+    repeat : int
+        Number of fresh interpreters to time
+
+    Output
+    ------
+    List of import times in seconds
+    '''
+    code = timer_code.format(path=module_dirs[module], module=module)
+    times = []
+    with tempfile.TemporaryDirectory() as cwd:
+        for _ in range(repeat):
+            result = subprocess.run([sys.executable, '-c', code], cwd=cwd,
+                                    capture_output=True, text=True, check=True)
+            times.append(float(result.stdout.strip().splitlines()[-1]))
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='functions', choices=sorted(module_dirs))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--limit', type=float, default=1.0,
+                        help='fail when the median import time in seconds is above this')
+    args = parser.parse_args()
+
+    times = time_import(args.module, args.repeat)
+    median = statistics.median(times)
+    print('import {}: best {:.3f}s, median {:.3f}s over {} runs'.format(args.module, min(times), median, len(times)))
+
+    if median > args.limit:
+        print('median import time is above the {:.1f}s limit'.format(args.limit))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
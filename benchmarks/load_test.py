@@ -0,0 +1,132 @@
+'''
+Load test for scoring_server.py. Sends synthetic tweets from
+synthetic.raw_tweets over a pool of concurrent clients, then reports the
+client side p50/p99 latency and throughput next to the server's /stats.
+
+With --self-host the server runs in this process on a free port, using
+the saved model bundle or, when there is none, a small bundle fitted on
+synthetic tweets, so the test needs nothing running beforehand.
+
+Usage
+-----
+python benchmarks/load_test.py --self-host
+python benchmarks/load_test.py --url http://127.0.0.1:8000 --requests 20000 --concurrency 64
+python benchmarks/load_test.py --self-host --no-preprocess --max-wait-ms 0
+'''
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+from functions import load_model_bundle, model_bundle_path
+from scoring_server import make_server
+from synthetic import raw_tweets
+
+def synthetic_bundle(n_tweets=20000, seed=42):
+    '''
+    Function to fit a vectorizer and classifier on synthetic tweets with
+    random labels, standing in for the model bundle when it is missing.
+    '''
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    tweets, labels = raw_tweets(n_tweets, seed=seed)
+    tfidf = TfidfVectorizer().fit(tweets)
+    model = LogisticRegression(max_iter=200).fit(tfidf.transform(tweets), labels)
+    return {'tfidf': tfidf, 'model': model}
+
+def post(url, texts, timeout=30):
+    '''
+    Function to send one /classify request and time it.
+
+    Output
+    ------
+    Seconds taken and whether the request succeeded
+    '''
+    body = json.dumps({'texts': texts}).encode('utf-8')
+    request = urllib.request.Request(url + '/classify', data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+        ok = True
+    except OSError:
+        ok = False
+    return time.perf_counter() - start, ok
+
+def run_load(url, tweets, n_requests, concurrency, texts_per_request):
+    '''
+    Function to send n_requests over concurrency client threads.
+
+    Output
+    ------
+    Dictionary with client side latency percentiles and throughput
+    '''
+    batches = [tweets[(i * texts_per_request) % len(tweets):][:texts_per_request] for i in range(n_requests)]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda texts: post(url, texts), batches))
+        elapsed = time.perf_counter() - start
+
+    latencies = np.array([seconds for seconds, ok in results if ok]) * 1000
+    n_ok = len(latencies)
+    return {'requests': n_requests,
+            'errors': n_requests - n_ok,
+            'concurrency': concurrency,
+            'texts_per_request': texts_per_request,
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(n_ok / elapsed, 1),
+            'tweets_per_second': round(n_ok * texts_per_request / elapsed, 1),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 2) if n_ok else None,
+            'p99_ms': round(float(np.percentile(latencies, 99)), 2) if n_ok else None}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--texts-per-request', type=int, default=1)
+    parser.add_argument('--self-host', action='store_true', help='start a server in this process')
+    parser.add_argument('--bundle', default=model_bundle_path)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    parser.add_argument('--no-preprocess', action='store_true', help='skip clean_tweet and lemmatize_tweet on the server')
+    parser.add_argument('--output', help='json file to write the results to')
+    args = parser.parse_args()
+
+    url = args.url
+    if args.self_host:
+        if os.path.exists(args.bundle):
+            bundle = load_model_bundle(args.bundle)
+        else:
+            print('{} not found, using a bundle fitted on synthetic tweets'.format(args.bundle))
+            bundle = synthetic_bundle()
+        server = make_server(bundle, port=0, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                             preprocess=not args.no_preprocess)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = 'http://{}:{}'.format(*server.server_address)
+
+    tweets, _ = raw_tweets(10000, seed=7)
+    # one request first so model loading and lazy imports are not timed
+    post(url, tweets[:1])
+    client = run_load(url, tweets, args.requests, args.concurrency, args.texts_per_request)
+    with urllib.request.urlopen(url + '/stats') as response:
+        server_stats = json.load(response)
+
+    print('client: {requests_per_second:,.0f} requests/sec, {tweets_per_second:,.0f} tweets/sec, '
+          'p50 {p50_ms} ms, p99 {p99_ms} ms, {errors} errors'.format(**client))
+    print('server: p50 {p50_ms} ms, p99 {p99_ms} ms, mean batch size {mean_batch_size}'.format(**server_stats))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'client': client, 'server': server_stats}, f, indent=1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+'''
+Benchmark of the text pipeline's hot path at several corpus sizes.
+
+Each stage runs on a synthetic corpus from synthetic.raw_tweets, in the
+order the notebooks run them: clean_tweet, decontracted, lemmatize_tweet,
+the simple_custom_features columns, the TF-IDF transform and the
+best_model.pickle predict. Each stage reports tweets per second from an
+untraced run and, from a second run under tracemalloc, the peak memory it
+allocated above what was already in use. Results are written as JSON, and
+a previous results file can be passed with --compare to print speedups.
+
+Stages whose optional dependencies are missing, such as the WordNet data
+for lemmatize_tweet or textblob, are recorded as skipped.
+
+Usage
+-----
+python benchmarks/pipeline.py
+python benchmarks/pipeline.py --sizes 1000 100000 1000000
+python benchmarks/pipeline.py --stages clean_tweet tfidf_transform --compare benchmarks/results/old.json
+python benchmarks/pipeline.py --no-memory
+'''
+import argparse
+import datetime
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+from functions import clean_tweet, decontracted, lemmatize_tweet, custom_feature_frame, best_model_path
+from synthetic import raw_tweets
+
+stage_names = ['clean_tweet', 'decontracted', 'lemmatize_tweet', 'simple_custom_features',
+               'tfidf_transform', 'predict']
+
+def traced_peak_mb(function):
+    '''
+    Function to run a stage under tracemalloc and return the most memory
+    it held at once above what was in use before it started, in MB. The
+    process's peak resident memory cannot be reset between stages, so it
+    would report the largest peak of any earlier stage instead.
+    '''
+    tracemalloc.start()
+    try:
+        start_memory = tracemalloc.get_traced_memory()[0]
+        function()
+        return (tracemalloc.get_traced_memory()[1] - start_memory) / 1e6
+    finally:
+        tracemalloc.stop()
+
+def run_stage(name, function, n_tweets, memory=True):
+    '''
+    Function to time one stage and record its throughput and peak memory.
+
+    Input
+    -----
+    name : str
+    function : callable
+        Runs the stage and returns its output
+    n_tweets : int
+
+    Optional Input
+    --------------
+    memory : bool
+        Whether to run the stage a second time under tracemalloc for its
+        peak memory, tracing slows it down so it is timed untraced
+
+    Output
+    ------
+    Stage output and a result dictionary
+    '''
+    start = time.perf_counter()
+    try:
+        output = function()
+    except LookupError as e:
+        # nltk raises LookupError when its corpora are not downloaded
+        reason = next(line.strip() for line in str(e).splitlines() if line.strip(' *'))
+        return None, {'stage': name, 'n_tweets': n_tweets, 'status': 'skipped', 'reason': reason}
+    except ImportError as e:
+        return None, {'stage': name, 'n_tweets': n_tweets, 'status': 'skipped', 'reason': str(e)}
+    seconds = time.perf_counter() - start
+    result = {'stage': name, 'n_tweets': n_tweets, 'status': 'ok', 'seconds': round(seconds, 4),
+              'tweets_per_second': round(n_tweets / seconds, 1)}
+    if memory:
+        result['peak_traced_mb'] = round(traced_peak_mb(function), 1)
+    return output, result
+
+def load_model(path):
+    '''
+    Function to load the classifier and the number of features it expects.
+    The synthetic vocabulary is generated at that size so the real
+    coefficients are used for predict.
+    '''
+    with open(path, 'rb') as f:
+        model = pickle.load(f)
+    return model, model.n_features_in_
+
+def benchmark_size(n_tweets, stages, model, n_features, seed=42, memory=True):
+    '''
+    Function to run the selected stages on a corpus of n_tweets.
+
+    Output
+    ------
+    List of result dictionaries
+    '''
+    tweets, _ = raw_tweets(n_tweets, vocab_size=n_features, seed=seed)
+    raw = pd.Series(tweets)
+    results = []
+
+    def record(name, function, fallback):
+        if name not in stages:
+            return fallback
+        output, result = run_stage(name, function, n_tweets, memory)
+        results.append(result)
+        print('{:>9,} {:<24}{}'.format(n_tweets, name, format_result(result)))
+        return fallback if output is None else output
+
+    cleaned = record('clean_tweet', lambda: raw.map(clean_tweet), None)
+    if cleaned is None:
+        cleaned = raw.map(clean_tweet)
+    record('decontracted', lambda: raw.map(decontracted), None)
+    lemmatized = record('lemmatize_tweet', lambda: cleaned.map(lemmatize_tweet), cleaned)
+    frame = pd.DataFrame({'message': raw})
+    record('simple_custom_features', lambda: custom_feature_frame(frame), None)
+
+    # the vocabulary is the n_features most frequent words of the corpus,
+    # fitting it is setup rather than part of the timed transform
+    tfidf = TfidfVectorizer(max_features=n_features).fit(lemmatized)
+    matrix = record('tfidf_transform', lambda: tfidf.transform(lemmatized), None)
+    if matrix is None:
+        matrix = tfidf.transform(lemmatized)
+    if matrix.shape[1] != n_features:
+        # small corpora have fewer distinct words than the model expects
+        matrix.resize((matrix.shape[0], n_features))
+    record('predict', lambda: model.predict(matrix), None)
+
+    return results
+
+def format_result(result):
+    '''
+    Function to format one result for printing.
+    '''
+    if result['status'] != 'ok':
+        return 'skipped: {}'.format(result['reason'])
+    line = '{:>12,.0f} tweets/sec'.format(result['tweets_per_second'])
+    if 'peak_traced_mb' in result:
+        line += ' {:>10.1f} MB peak traced'.format(result['peak_traced_mb'])
+    return line
+
+def environment():
+    '''
+    Function to describe the machine and code the results came from.
+    '''
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_dir,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__}
+
+def compare(results, previous_path):
+    '''
+    Function to print the speedup of each stage against a previous
+    results file.
+    '''
+    with open(previous_path) as f:
+        previous = json.load(f)
+    before = {(r['n_tweets'], r['stage']): r for r in previous['results'] if r['status'] == 'ok'}
+    print('\ncompared with {} ({})'.format(previous_path, previous['environment'].get('commit', '')))
+    for result in results:
+        old = before.get((result['n_tweets'], result['stage']))
+        if old is None or result['status'] != 'ok':
+            continue
+        line = '{:>9,} {:<24}{:>8.2f}x speed'.format(result['n_tweets'], result['stage'],
+                                                      result['tweets_per_second'] / old['tweets_per_second'])
+        # results from before the traced peak was measured have no comparable memory figure
+        if 'peak_traced_mb' in result and 'peak_traced_mb' in old:
+            line += ' {:>+10.1f} MB peak traced'.format(result['peak_traced_mb'] - old['peak_traced_mb'])
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--stages', nargs='+', default=stage_names, choices=stage_names)
+    parser.add_argument('--model', default=best_model_path)
+    parser.add_argument('--output', help='defaults to benchmarks/results/pipeline_<timestamp>.json')
+    parser.add_argument('--compare', help='previous results file to compare against')
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run that measures peak memory')
+    args = parser.parse_args()
+
+    model, n_features = load_model(args.model)
+    results = []
+    for n_tweets in args.sizes:
+        results.extend(benchmark_size(n_tweets, args.stages, model, n_features, memory=not args.no_memory))
+
+    output = args.output or os.path.join(repo_dir, 'benchmarks', 'results', 'pipeline_{}.json'.format(
+        datetime.datetime.now().strftime('%Y%m%d_%H%M%S')))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=1)
+    print('results written to {}'.format(output))
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+'''
+Benchmark comparing the old DataFrame scoring route with predict_sentiment.
+
+The old route wraps the TF-IDF output in pd.DataFrame.sparse.from_spmatrix
+with one column per vocabulary term before calling model.predict. The new
+route passes CSR batches straight to the classifier. Both run on the same
+synthetic corpus and the same fitted vectorizer and model, and the script
+checks that they agree.
+
+Usage
+-----
+python benchmarks/sparse_scoring.py
+python benchmarks/sparse_scoring.py --n-tweets 10000 --vocab-size 5000
+'''
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+from functions import predict_sentiment
+from synthetic import lemmatized_tweets
+
+def measure(function):
+    '''
+    Function to run a callable once and record wall time and the
+    tracemalloc peak.
+
+    Output
+    ------
+    Result of the callable, seconds, peak MB
+    '''
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def dataframe_route(texts, tfidf, model):
+    '''
+    Function reproducing the data_prep notebooks' original scoring cells.
+    '''
+    feature_names = tfidf.get_feature_names_out() if hasattr(tfidf, 'get_feature_names_out') \
+        else tfidf.get_feature_names()
+    tfidf_df = pd.DataFrame.sparse.from_spmatrix(tfidf.transform(texts), columns=feature_names)
+    return model.predict(tfidf_df)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-tweets', type=int, default=100000)
+    parser.add_argument('--vocab-size', type=int, default=26000,
+                        help='the whole-dataset TF-IDF in the modeling notebook has 26067 terms')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    train, labels = lemmatized_tweets(20000, args.vocab_size, seed=0)
+    tfidf = TfidfVectorizer(ngram_range=(1,1))
+    model = LogisticRegression(max_iter=300).fit(tfidf.fit_transform(train), labels)
+    texts, _ = lemmatized_tweets(args.n_tweets, args.vocab_size, seed=1)
+    print('{} tweets, {} terms in vocabulary'.format(len(texts), len(tfidf.vocabulary_)))
+
+    old, old_seconds, old_peak = measure(lambda: dataframe_route(texts, tfidf, model))
+    new, new_seconds, new_peak = measure(lambda: predict_sentiment(texts, tfidf, model, args.batch_size))
+
+    print('{:<24}{:>10}{:>14}{:>16}'.format('route', 'seconds', 'tweets/sec', 'peak MB'))
+    for name, seconds, peak in [('DataFrame.sparse', old_seconds, old_peak),
+                                ('predict_sentiment', new_seconds, new_peak)]:
+        print('{:<24}{:>10.2f}{:>14,.0f}{:>16.1f}'.format(name, seconds, len(texts) / seconds, peak))
+    print('predictions identical: {}'.format(bool(np.array_equal(old, new))))
+
+if __name__ == '__main__':
+    main()
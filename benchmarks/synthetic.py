@@ -0,0 +1,154 @@
+'''
+Synthetic tweet corpora for the benchmarks, generated offline and
+reproducibly from a seed.
+
+raw_tweets imitates the labeled twitter sentiment data: retweet prefixes,
+mentions, hashtags, t.co links, contractions, punctuation, html entities
+and repeated retweets of the same text. lemmatized_tweets imitates the
+cleaned and lemmatized text that reaches the TF-IDF vectorizer.
+'''
+import itertools
+
+import numpy as np
+
+# frequent words of the labeled data, the long tail comes from made-up words
+common_words = ['climate', 'change', 'the', 'to', 'is', 'of', 'a', 'and', 'global', 'warming', 'in',
+                'for', 'on', 'we', 'this', 'trump', 'it', 'that', 'you', 'are', 'real', 'about', 'be',
+                'not', 'with', 'people', 'world', 'believe', 'science', 'new', 'just', 'will', 'denier',
+                'planet', 'fight', 'energy', 'carbon', 'epa', 'paris', 'agreement', 'scientists', 'hoax',
+                'weather', 'environment', 'fossil', 'fuel', 'emissions', 'ice', 'sea', 'level', 'rising',
+                'temperature', 'record', 'heat', 'storm', 'hurricane', 'flood', 'drought', 'policy',
+                'president', 'obama', 'government', 'report', 'study', 'news', 'via', 'says', 'could',
+                'future', 'our', 'us', 'need', 'action', 'now', 'time', 'think', 'know', 'dicaprio',
+                'documentary', 'watch', 'beforetheflood', 'leonardo', 'green', 'solar', 'wind', 'coal',
+                'oil', 'gas', 'pollution', 'earth', 'nature', 'species', 'extinction', 'forest', 'ocean']
+contractions = ["don't", "can't", "won't", "it's", "i'm", "doesn't", "isn't", "we're", "they're",
+                "you'll", "that's", "there's", "didn't", "wouldn't", "he'd"]
+hashtags = ['#climate', '#ClimateChange', '#globalwarming', '#ActOnClimate', '#environment',
+            '#BeforeTheFlood', '#COP22', '#science', '#Trump', '#parisagreement']
+punctuation = ['.', ',', '!', '?', '...', ':', ';', '!!', '&amp;', '$', '%']
+syllables = ['ba', 'ri', 'to', 'men', 'sa', 'lo', 'qu', 'ex', 'ion', 'ter', 'pa', 'nd', 'str', 'ea', 'ly',
+             'co', 'vi', 'ge', 'mo', 'tan', 'ru', 'fi', 'de', 'ka', 'pro', 'sel', 'un', 'wa', 'ho', 'ne']
+
+def made_up_words(n_words, rng):
+    '''
+    Function to build a vocabulary of distinct pronounceable words from
+    two to four syllables.
+
+    Input
+    -----
+    n_words : int
+    rng : numpy Generator
+
+    Output
+    ------
+    List of words in random order
+    '''
+    words = {}
+    for n_syllables in range(2, 5):
+        for parts in itertools.product(syllables, repeat=n_syllables):
+            words.setdefault(''.join(parts))
+            if len(words) == n_words:
+                break
+        if len(words) == n_words:
+            break
+    words = list(words)
+    return [words[i] for i in rng.permutation(len(words))]
+
+def zipf_probabilities(n_words):
+    '''
+    Function to get word probabilities that fall off with rank like
+    natural language.
+    '''
+    ranks = np.arange(1, n_words + 1)
+    return (1 / ranks) / (1 / ranks).sum()
+
+def raw_tweets(n_tweets, vocab_size=30000, duplicate_rate=0.2, seed=42):
+    '''
+    Function to generate raw tweets resembling the labeled twitter
+    sentiment data, with random labels in the project's -1 to 2 range.
+
+    Input
+    -----
+    n_tweets : int
+
+    Optional Input
+    --------------
+    vocab_size : int
+        Number of made-up tail words on top of the common words
+    duplicate_rate : float
+        Share of tweets that repeat an earlier tweet, like retweets
+    seed : int
+
+    Output
+    ------
+    List of tweets and numpy array of labels
+    '''
+    rng = np.random.default_rng(seed)
+    vocab = np.array(common_words + made_up_words(vocab_size, rng), dtype=object)
+    probabilities = zipf_probabilities(len(vocab))
+
+    n_unique = max(1, int(n_tweets * (1 - duplicate_rate)))
+    lengths = rng.integers(6, 25, n_unique)
+    words = rng.choice(vocab, size=lengths.sum(), p=probabilities)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+    # extra tokens are drawn for every position and kept where a coin flip says so
+    extras = [(0.03, np.array(contractions, dtype=object)),
+              (0.04, np.array(hashtags, dtype=object)),
+              (0.08, np.array(punctuation, dtype=object))]
+    for rate, choices in extras:
+        keep = rng.random(len(words)) < rate
+        words[keep] = choices[rng.integers(0, len(choices), keep.sum())]
+
+    retweet = rng.random(n_unique) < 0.3
+    mention = rng.random(n_unique) < 0.25
+    link = rng.random(n_unique) < 0.4
+    users = rng.integers(0, 100000, n_unique)
+    links = rng.integers(0, 36 ** 8, n_unique)
+
+    tweets = []
+    for i in range(n_unique):
+        text = ' '.join(words[offsets[i]:offsets[i + 1]])
+        if mention[i]:
+            text = '@user{} {}'.format(users[i] // 7, text)
+        if link[i]:
+            text = '{} https://t.co/{}'.format(text, np.base_repr(links[i], 36).lower())
+        if retweet[i]:
+            text = 'RT @user{}: {}'.format(users[i], text)
+        tweets.append(text)
+
+    repeats = rng.integers(0, n_unique, n_tweets - n_unique)
+    tweets.extend(tweets[i] for i in repeats)
+    order = rng.permutation(n_tweets)
+    tweets = [tweets[i] for i in order]
+    labels = rng.integers(-1, 3, n_tweets)
+    return tweets, labels
+
+def lemmatized_tweets(n_tweets, vocab_size, seed=42):
+    '''
+    Function to generate lemmatized-looking tweets with a Zipfian word
+    distribution and random labels in the project's -1 to 2 range.
+
+    Input
+    -----
+    n_tweets : int
+    vocab_size : int
+
+    Optional Input
+    --------------
+    seed : int
+
+    Output
+    ------
+    List of tweets and numpy array of labels
+    '''
+    rng = np.random.default_rng(seed)
+    vocab = np.array(['w{}'.format(i) for i in range(vocab_size)])
+    probabilities = zipf_probabilities(vocab_size)
+    lengths = rng.integers(5, 20, n_tweets)
+    words = rng.choice(vocab, size=lengths.sum(), p=probabilities)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    tweets = [' '.join(words[offsets[i]:offsets[i + 1]]) for i in range(n_tweets)]
+    labels = rng.integers(-1, 3, n_tweets)
+    return tweets, labels
@@ -0,0 +1,78 @@
+'''
+One-off converter that writes a Parquet copy next to each of the project's
+csv datasets. Once a copy exists, read_table and the loaders in the
+function modules read it instead of parsing the csv, and only the columns
+a stage asks for are loaded. A csv that changes afterwards is read
+directly until it is converted again, which a rerun does for every copy
+older than its csv. Requires pyarrow.
+
+Usage
+-----
+python convert_to_parquet.py
+python convert_to_parquet.py --overwrite
+'''
+import argparse
+import glob
+import os
+
+import pandas as pd
+
+from functions import module_dir, fresh_columnar_path, write_table, string_features
+
+# integer columns of the prepared training data made by custom_feature_frame
+prepared_dtypes = {name: 'int8' if kind == 'present' else 'int16' for name, _, kind in string_features}
+prepared_dtypes.update({'sentiment': 'int8', 'tweetid': 'int64', 'tweet_length': 'int16',
+                        'textblob_polarity': 'float32', 'textblob_subjectivity': 'float32'})
+
+# glob pattern relative to the repository, pd.read_csv arguments and dtypes
+datasets = [('building_classifier/data/twitter_sentiment_data.csv',
+             {},
+             {'sentiment': 'int8', 'tweetid': 'int64'}),
+            ('building_classifier/data/prepared_twitter_sentiment_data.csv',
+             {'index_col': 0},
+             prepared_dtypes),
+            ('applying_classifier/time_series/data/raw_data/daily_tweets/tweets_*.csv',
+             {'index_col': 0, 'lineterminator': '\n'},
+             {'date': 'datetime64[ns]'}),
+            ('applying_classifier/location/data/raw_data/date_tweets_day_*.csv',
+             {'index_col': 0},
+             {}),
+            ('applying_classifier/location/data/geographic_plotting_data.csv',
+             {'index_col': 0},
+             {'state': 'category', 'num_sent_observations': 'int16'})]
+
+def convert_datasets(overwrite=False):
+    '''
+    Function to write a Parquet copy of every csv dataset that exists and
+    has no copy, or only one older than the csv.
+
+    Optional Input
+    --------------
+    overwrite : bool
+        Whether to replace Parquet copies that are still up to date
+
+    Output
+    ------
+    List of (csv path, Parquet path, csv MB, Parquet MB)
+    '''
+    converted = []
+    for pattern, csv_kwargs, dtypes in datasets:
+        for path in sorted(glob.glob(os.path.join(module_dir, pattern))):
+            if fresh_columnar_path(path) is not None and not overwrite:
+                continue
+            columnar = write_table(pd.read_csv(path, **csv_kwargs), path, dtypes)
+            converted.append((path, columnar, os.path.getsize(path) / 1e6, os.path.getsize(columnar) / 1e6))
+    return converted
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--overwrite', action='store_true', help='rewrite existing Parquet copies')
+    args = parser.parse_args()
+
+    converted = convert_datasets(args.overwrite)
+    for path, columnar, csv_mb, parquet_mb in converted:
+        print('{}: {:.1f} MB csv -> {:.1f} MB parquet'.format(os.path.relpath(columnar, module_dir), csv_mb, parquet_mb))
+    print('{} datasets converted'.format(len(converted)))
+
+if __name__ == '__main__':
+    main()
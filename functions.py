@@ -1,29 +1,342 @@
 import pandas as pd
 import numpy as np
-from nltk.corpus import stopwords
-from nltk.tokenize import RegexpTokenizer
-from nltk.tokenize import punkt
-import nltk
-from nltk import word_tokenize
-from wordcloud import WordCloud
-from nltk.stem import WordNetLemmatizer
-from textblob import TextBlob
 import string, re
+import os
+import copy
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from functools import partial, lru_cache
+from datetime import datetime, timezone
+from stage_metrics import StageMetrics, metrics
 
 import warnings
 warnings.filterwarnings("ignore")
-import seaborn as sns
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mtick
-plt.rcParams['lines.linewidth'] = 5
-plt.rcParams['xtick.labelsize'] = 20
-plt.rcParams['ytick.labelsize'] = 20
-plt.rcParams['figure.figsize'] = 16, 8
-plt.rcParams['font.size'] = 20
-
-data = pd.read_csv('./building_classifier/data/twitter_sentiment_data.csv')
+# nltk, textblob, seaborn and matplotlib are imported inside the functions
+# that use them so importing this module only costs pandas and numpy
+
+module_dir = os.path.dirname(os.path.abspath(__file__))
+twitter_sentiment_path = os.path.join(module_dir, 'building_classifier', 'data', 'twitter_sentiment_data.csv')
+building_classifier_dir = os.path.join(module_dir, 'building_classifier')
+model_bundle_path = os.path.join(building_classifier_dir, 'model_bundle.pickle')
+best_model_path = os.path.join(building_classifier_dir, 'best_model.pickle')
+prepared_data_path = os.path.join(building_classifier_dir, 'data', 'prepared_twitter_sentiment_data.csv')
+
 class_labels = ['Anti','Neutral','Man','News']
 
+def columnar_path(path):
+    '''
+    Function to get the Parquet counterpart of a csv path.
+    
+    Input
+    -----
+    path : str
+        Ex: './data/twitter_sentiment_data.csv'
+        
+    Output
+    ------
+    Same path with a .parquet extension
+    '''
+    return os.path.splitext(path)[0] + '.parquet'
+
+def fresh_columnar_path(path):
+    '''
+    Function to get the Parquet copy of a csv when it is at least as new
+    as the csv, so a csv rewritten after it was converted is not read
+    from its stale copy.
+    
+    Input
+    -----
+    path : str
+        Location of the csv
+        
+    Output
+    ------
+    Path of the Parquet copy, None when there is none or it is older than
+    the csv
+    '''
+    columnar = columnar_path(path)
+    if not os.path.exists(columnar):
+        return None
+    if os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(columnar):
+        return None
+    return columnar
+
+def csv_column_positions(path, columns, **csv_kwargs):
+    '''
+    Function to find the positions of columns in a csv header for
+    pd.read_csv's usecols. Positions rather than names are used so an
+    unnamed index column read with index_col=0 is kept.
+    
+    Input
+    -----
+    path : str
+    columns : list (str)
+    
+    Optional Input
+    --------------
+    csv_kwargs :
+        The pd.read_csv arguments the csv will be read with
+        
+    Output
+    ------
+    List of column positions
+    '''
+    csv_kwargs.pop('chunksize', None)
+    header = pd.read_csv(path, nrows=0, **csv_kwargs)
+    positions = [i for i, name in enumerate(header.columns) if name in columns]
+    if csv_kwargs.get('index_col') == 0:
+        positions = [0] + [i + 1 for i in positions]
+    return positions
+
+def read_table(path, columns=None, **csv_kwargs):
+    '''
+    Function to read a dataset from its Parquet copy when one has been
+    written next to the csv since the csv last changed, and from the csv
+    otherwise. Only the
+    requested columns are parsed in either format.
+    
+    Input
+    -----
+    path : str
+        Location of the csv
+    
+    Optional Input
+    --------------
+    columns : list (str)
+        Columns to read, all columns when None
+        Ex: ['date', 'tweet']
+    csv_kwargs :
+        Passed to pd.read_csv when falling back to the csv
+        Ex: index_col=0, lineterminator='\\n'
+        
+    Output
+    ------
+    Dataframe with the requested columns
+    '''
+    columnar = fresh_columnar_path(path)
+    if columnar is not None:
+        # needs pyarrow or fastparquet, which only the converted datasets use
+        return pd.read_parquet(columnar, columns=columns)
+    
+    if columns is not None:
+        csv_kwargs['usecols'] = csv_column_positions(path, columns, **csv_kwargs)
+    frame = pd.read_csv(path, **csv_kwargs)
+    
+    return frame if columns is None else frame[list(columns)]
+
+def write_table(frame, path, dtypes=None):
+    '''
+    Function to write a dataset as Parquet next to its csv so read_table
+    picks it up.
+    
+    Input
+    -----
+    frame : Pandas Dataframe
+    path : str
+        Location of the csv the dataset came from
+    
+    Optional Input
+    --------------
+    dtypes : dict
+        Column to dtype mapping applied before writing
+        Ex: {'sentiment': 'int8', 'date': 'datetime64[ns]'}
+        
+    Output
+    ------
+    Path of the Parquet file
+    '''
+    if dtypes:
+        frame = frame.astype({column: dtype for column, dtype in dtypes.items() if column in frame})
+    columnar = columnar_path(path)
+    frame.to_parquet(columnar)
+    
+    return columnar
+
+def set_plot_style():
+    '''
+    Function to import pyplot and apply the plot settings used
+    throughout the project.
+    
+    Input
+    -----
+    None
+    
+    Optional Input
+    --------------
+    None
+        
+    Output
+    ------
+    matplotlib.pyplot module
+    '''
+    import matplotlib.pyplot as plt
+    plt.rcParams['lines.linewidth'] = 5
+    plt.rcParams['xtick.labelsize'] = 20
+    plt.rcParams['ytick.labelsize'] = 20
+    plt.rcParams['figure.figsize'] = 16, 8
+    plt.rcParams['font.size'] = 20
+    return plt
+
+@lru_cache(maxsize=None)
+def load_twitter_sentiment_data(path=twitter_sentiment_path):
+    '''
+    Function to read the labeled twitter sentiment data once per process.
+    
+    Input
+    -----
+    None
+    
+    Optional Input
+    --------------
+    path : str
+        Location of the csv, defaults to building_classifier/data next
+        to this file
+        
+    Output
+    ------
+    Dataframe of labeled tweets, shared between calls
+    '''
+    return read_table(path)
+
+def __getattr__(name):
+    # module.data still works, but the csv is only read on first access
+    if name == 'data':
+        return load_twitter_sentiment_data()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+class LemmatizationEngine:
+    '''
+    Class that loads the english stopwords and the WordNet lemmatizer
+    once per process and caches word to lemma lookups.
+
+    Input
+    -----
+    None
+
+    Optional Input
+    --------------
+    max_cache_size : int
+        Number of words kept in the lemma cache before the oldest
+        entries are evicted
+        Ex: 100000
+
+    Output
+    ------
+    Callable object returning lemmatized tweets as strings, with cache
+    hits and misses available as attributes
+    '''
+    def __init__(self, max_cache_size=100000):
+        self.max_cache_size = max_cache_size
+        self.letters = re.compile(r'[a-z]+')
+        self.stop_words = None
+        self.lemmatizer = None
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # NLTK resources are reloaded in the receiving process
+        state = self.__dict__.copy()
+        state['stop_words'] = None
+        state['lemmatizer'] = None
+        state['cache'] = {}
+        return state
+
+    def load(self):
+        '''
+        Function to load the stopwords and lemmatizer if they have not
+        been loaded yet in this process.
+        '''
+        if self.lemmatizer is None:
+            from nltk.corpus import stopwords
+            from nltk.stem import WordNetLemmatizer
+            self.stop_words = frozenset(stopwords.words('english'))
+            self.lemmatizer = WordNetLemmatizer()
+        return self
+
+    def cache_info(self):
+        '''
+        Function to report lemma cache usage.
+
+        Output
+        ------
+        Dictionary with hits, misses, current size and max size
+        '''
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.cache),
+                'max_size': self.max_cache_size}
+
+    def clear_cache(self):
+        '''
+        Function to empty the lemma cache and reset its counters.
+        '''
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def lemmatize_word(self, word):
+        '''
+        Function to lemmatize a single lowercase word.
+
+        Input
+        -----
+        word : str
+
+        Optional Input
+        --------------
+        None
+
+        Output
+        ------
+        Lemma of the word, or an empty string when the word is a
+        stopword or its lemma is two letters or fewer
+        '''
+        lemma = self.cache.get(word)
+        if lemma is not None:
+            self.hits += 1
+            return lemma
+        self.misses += 1
+        self.load()
+        if word in self.stop_words:
+            lemma = ''
+        else:
+            lemma = self.lemmatizer.lemmatize(word)
+            if len(lemma) <= 2:
+                lemma = ''
+        if len(self.cache) >= self.max_cache_size:
+            # dicts keep insertion order, so this drops the oldest entry
+            del self.cache[next(iter(self.cache))]
+        self.cache[word] = lemma
+        return lemma
+
+    def lemmatize(self, data):
+        '''
+        Function to lemmatize a single tweet.
+
+        Input
+        -----
+        data : str
+
+        Optional Input
+        --------------
+        None
+
+        Output
+        ------
+        String containing lemmatized tweet
+        '''
+        lemmas = (self.lemmatize_word(word) for word in self.letters.findall(data))
+        return ' '.join(lemma for lemma in lemmas if lemma)
+
+    def __call__(self, data):
+        return self.lemmatize(data)
+
+lemmatization_engine = LemmatizationEngine()
+
+@metrics.instrument('lemmatize_tweet')
 def lemmatize_tweet(data):
     '''
     Function to lemmatize tweets
@@ -40,16 +353,62 @@ def lemmatize_tweet(data):
     ------
     String containing lemmatized tweets
     '''   
-    stop_words = stopwords.words('english')
-    lemmatizer = WordNetLemmatizer()
-    lem_data = tokenize_single(data,r'[a-z]+')
-    lem_data = [lemmatizer.lemmatize(word) for word in lem_data if word not in stop_words]
-    lem_data = [word for word in lem_data if len(word) > 2]
-    lem_tweet = untokenize_single(lem_data)
-    lem_tweet = lem_tweet.strip()
-    
-    return lem_tweet
+    # stopwords, lemmatizer and word lemmas are shared across calls
+    return lemmatization_engine.lemmatize(data)
+
+class TweetNormalizer:
+    '''
+    Class that compiles the clean_tweet patterns once and applies the
+    same cleanup in two regex scans plus a letter filter.
 
+    Input
+    -----
+    None
+
+    Optional Input
+    --------------
+    None
+
+    Output
+    ------
+    Callable object returning cleaned tweets as strings, identical to
+    the chained clean_tweet steps
+    '''
+    def __init__(self):
+        # hashtags, mentions, hyperlinks and every other symbol become spaces
+        self.symbols = re.compile(r"(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)")
+        # after the first scan no '@', '.' or apostrophes remain, so the
+        # mention, 'pic.' and contraction passes can never match; only the
+        # link remainder and retweet markers are left to remove
+        self.links_retweets = re.compile(r'http\S+|RT')
+        self.letters = re.compile(r'[A-Za-z]+')
+
+    def normalize(self, data):
+        '''
+        Function to clean a single tweet.
+
+        Input
+        -----
+        data : str
+
+        Optional Input
+        --------------
+        None
+
+        Output
+        ------
+        Cleaned tweet as string
+        '''
+        data = self.symbols.sub(' ', data)
+        data = self.links_retweets.sub('', data)
+        return ' '.join(self.letters.findall(data)).lower()
+
+    def __call__(self, data):
+        return self.normalize(data)
+
+tweet_normalizer = TweetNormalizer()
+
+@metrics.instrument('clean_tweet')
 def clean_tweet(data):
     '''
     Function to clean tweets
@@ -66,25 +425,77 @@ def clean_tweet(data):
     ------
     Cleaned tweets as strings
     ''' 
-    #removing hashtags, hyperlinks, mentions
-    data = ' '.join(re.sub("(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)"," ",data).split())
-    # removing mentions
-    data = re.sub('(@[A-Za-z0-9]+)', '', data)
-    # removing links
-    data = re.sub(r'http\S+', '', data)
-    data = re.sub(r'pic\.\S+', '', data)
-    # convert contractions
-    data = decontracted(data)
-    # removing retweets
-    data = re.sub("RT",'',data).strip()
-    # making lowercase
-    data = data.lower()
-    
-    # filtering for just letters
-    data = tokenize_single(data, r'[a-zA-Z]+')
-    data = untokenize_single(data)
+    # removing hashtags, hyperlinks, mentions, contractions and retweets,
+    # lowercasing and filtering for just letters in one compiled pass
+    return tweet_normalizer.normalize(data)
+
+def preprocess_chunk(texts, clean=True):
+    '''
+    Function to clean and lemmatize a list of tweets in one process.
+
+    Input
+    -----
+    texts : list (str)
+
+    Optional Input
+    --------------
+    clean : bool
+        Whether to run clean_tweet before lemmatizing
+
+    Output
+    ------
+    List of cleaned and lemmatized tweets in the same order
+    '''
+    if clean:
+        return [lemmatization_engine.lemmatize(tweet_normalizer.normalize(str(x))) for x in texts]
+    return [lemmatization_engine.lemmatize(str(x)) for x in texts]
+
+def warm_up_worker():
+    '''
+    Function run once when a pool worker starts so stopwords and WordNet
+    are loaded per worker rather than per chunk.
+    '''
+    lemmatization_engine.load()
+    lemmatization_engine.lemmatizer.lemmatize('tweets')
+
+def preprocess_corpus(series, n_jobs=None, chunk_size=5000, clean=True):
+    '''
+    Function to clean and lemmatize a series of tweets across a process
+    pool while keeping row order.
+
+    Input
+    -----
+    series : Pandas Series (str)
+
+    Optional Input
+    --------------
+    n_jobs : int
+        Number of worker processes, None or -1 for every core and 1 to
+        stay in the current process
+    chunk_size : int
+        Number of tweets sent to a worker at a time
+        Ex: 5000
+    clean : bool
+        Whether to run clean_tweet before lemmatizing
+
+    Output
+    ------
+    Series of cleaned and lemmatized tweets with the input index
+    '''
+    texts = series.tolist()
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
     
-    return data
+    with metrics.stage('clean_and_lemmatize' if clean else 'lemmatize', rows=len(texts)):
+        if n_jobs == 1 or len(texts) <= chunk_size:
+            processed = preprocess_chunk(texts, clean=clean)
+        else:
+            chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks)), initializer=warm_up_worker) as pool:
+                # map yields results in submission order
+                processed = list(chain.from_iterable(pool.map(partial(preprocess_chunk, clean=clean), chunks)))
+    
+    return pd.Series(processed, index=series.index, name=series.name)
 
 def decontracted(phrase):
     '''
@@ -159,10 +570,12 @@ def tokenize_single(data, parameters):
     ------
     Tokenized data
     '''   
+    from nltk.tokenize import RegexpTokenizer
     tokenizer = RegexpTokenizer(parameters)
     data = tokenizer.tokenize(data)
     return data
 
+@metrics.instrument('tokenize')
 def tokenize(data, parameters):
     '''
     Function to tokenize any series of strings.
@@ -181,6 +594,7 @@ def tokenize(data, parameters):
     ------
     Tokenized data
     '''
+    from nltk.tokenize import RegexpTokenizer
     tokenizer = RegexpTokenizer(parameters)
     data.message = data.message.apply(lambda x: tokenizer.tokenize(x))
     return data.message
@@ -205,6 +619,69 @@ def untokenize(data):
     data.message = data.message.apply(lambda x: x.replace(',',' '))
     return data.head()
 
+def class_statistics(data, columns, thresholds=None, class_column='sentiment'):
+    '''
+    Function to compute per-class statistics for any set of columns in a
+    single groupby pass, without building per-class copies of the data.
+    
+    Input
+    -----
+    data : Pandas Dataframe
+    columns : list (str)
+        Numeric columns to summarise
+    
+    Optional Input
+    --------------
+    thresholds : list or dict
+        Threshold scores applied to every column, or a dictionary of
+        column name to thresholds
+        Ex: [0, 0.5]
+    class_column : str
+        Column holding the class labels
+        
+    Output
+    ------
+    Tidy dataframe with class, column, statistic, threshold and value
+    columns. Statistics are:
+        mean - average value of the column
+        present_rate - share of rows where the column is above 0
+        below_rate - share of rows strictly below the threshold
+        above_rate - share of rows strictly above the threshold
+    '''
+    if thresholds is None:
+        thresholds = {}
+    elif not isinstance(thresholds, dict):
+        thresholds = {column: list(thresholds) for column in columns}
+    
+    # (column, statistic, threshold) for every derived series, keyed by position
+    specs = []
+    derived = {}
+    for column in columns:
+        values = data[column]
+        specs.append((column, 'mean', np.nan))
+        derived[len(derived)] = values
+        specs.append((column, 'present_rate', np.nan))
+        derived[len(derived)] = values > 0
+        for score in thresholds.get(column, []):
+            specs.append((column, 'below_rate', score))
+            derived[len(derived)] = values < score
+            specs.append((column, 'above_rate', score))
+            derived[len(derived)] = values > score
+    
+    # the mean of a boolean series is the share of rows where it holds
+    grouped = pd.DataFrame(derived).groupby(data[class_column].values).mean()
+    
+    rows = []
+    for position, (column, statistic, score) in enumerate(specs):
+        for label, value in grouped[position].items():
+            rows.append({'class': label,
+                         'column': column,
+                         'statistic': statistic,
+                         'threshold': score,
+                         'value': value})
+    
+    return pd.DataFrame(rows)
+
 def textblob_sentiment_analysis(data, column, score):
     '''
     Function to take in a column name and theshold score that first returns 
@@ -228,34 +705,17 @@ def textblob_sentiment_analysis(data, column, score):
     percentage that is above and the percentage that is below a the
     score input
     '''
-    # Create dataframe subsets
-    anti = data[data.sentiment == -1]
-    neutral = data[data.sentiment == 0]
-    man = data[data.sentiment == 1]
-    news = data[data.sentiment == 2]
-    
-    # Get percentages for below threshold
-    below_perc_anit = round((len(anti[anti[column] < score]) / len(anti)), 3)
-    below_perc_neutral = round((len(neutral[neutral[column] < score]) / len(neutral)), 3)
-    below_perc_man = round((len(man[man[column] < score]) / len(man)), 3)
-    below_perc_news = round((len(news[news[column] < score]) / len(news)), 3)
-    
-    # Get percentages for above threshold
-    above_perc_anit = round((len(anti[anti[column] > score]) / len(anti)), 3)
-    above_perc_neutral = round((len(neutral[neutral[column] > score]) / len(neutral)), 3)
-    above_perc_man = round((len(man[man[column] > score]) / len(man)), 3)
-    above_perc_news = round((len(news[news[column] > score]) / len(news)), 3)
+    # Every rate for every class in one groupby pass
+    stats = class_statistics(data, [column], thresholds=[score])
+    rates = stats.pivot(index='class', columns='statistic', values='value').round(3)
+    class_names = {-1: 'anti man-made', 0: 'neutral', 1: 'man-made', 2: 'news'}
     
     # Printing results
-    print('{}% of the anti man-made data is below the {} threshold of {}'.format(below_perc_anit, column, score))
-    print('{}% of the neutral data is below the {} threshold of {}'.format(below_perc_neutral, column, score))
-    print('{}% of the man-made data is below the {} threshold of {}'.format(below_perc_man, column, score))
-    print('{}% of the news data is below the {} threshold of {}'.format(below_perc_news, column, score))
+    for label, name in class_names.items():
+        print('{}% of the {} data is below the {} threshold of {}'.format(rates.below_rate[label], name, column, score))
     print('\n')
-    print('{}% of the anti man-made data is above the {} threshold of {}'.format(above_perc_anit, column, score))
-    print('{}% of the neutral data is above the {} threshold of {}'.format(above_perc_neutral, column, score))
-    print('{}% of the man-made data is above the {} threshold of {}'.format(above_perc_man, column, score))
-    print('{}% of the news data is above the {} threshold of {}'.format(above_perc_news, column, score))
+    for label, name in class_names.items():
+        print('{}% of the {} data is above the {} threshold of {}'.format(rates.above_rate[label], name, column, score))
     
 
 def element_present_plot(column_name, element, title):
@@ -284,20 +744,15 @@ def element_present_plot(column_name, element, title):
     Plot showing the rate at which the element appears in each of
     the indvidual subsets
     '''  
+    plt = set_plot_style()
+    import seaborn as sns
+    data = load_twitter_sentiment_data()
     # Creating column column
-    data[column_name] = data.message.apply(lambda x: 1 if element in x else 0)
+    data[column_name] = data.message.str.contains(element, regex=False).astype(int)
 
-    # Resetting class subsets to include new column
-    anti = data[data.sentiment == -1]
-    neutral = data[data.sentiment == 0]
-    man = data[data.sentiment == 1]
-    news = data[data.sentiment == 2]
-
-    # Specifying y-values
-    element_frequencies = ((anti[column_name].sum() / len(anti)), 
-                           (neutral[column_name].sum() / len(neutral)),
-                           (man[column_name].sum() / len(man)),
-                           (news[column_name].sum() / len(news)))
+    # Specifying y-values from one groupby pass over the classes
+    stats = class_statistics(data, [column_name])
+    element_frequencies = tuple(stats[stats.statistic == 'present_rate'].value)
 
     # Building graph
     plt.figure(figsize=(20,10))
@@ -335,20 +790,15 @@ def element_count_plot(column_name, element, title):
     Plot showing the average number of times that element shows
     up per tweet for each subset
     '''  
+    plt = set_plot_style()
+    import seaborn as sns
+    data = load_twitter_sentiment_data()
     # Creating column column
-    data[column_name] = data.message.apply(lambda x: x.count(element))
-
-    # Resetting class subsets to include new column
-    anti = data[data.sentiment == -1]
-    neutral = data[data.sentiment == 0]
-    man = data[data.sentiment == 1]
-    news = data[data.sentiment == 2]
+    data[column_name] = data.message.str.count(re.escape(element))
 
-    # Specifying y-values
-    element_count_means = ((anti[column_name].mean()),
-                           (neutral[column_name].mean()),
-                           (man[column_name].mean()),
-                           (news[column_name].mean()))
+    # Specifying y-values from one groupby pass over the classes
+    stats = class_statistics(data, [column_name])
+    element_count_means = tuple(stats[stats.statistic == 'mean'].value)
 
     # Building graph
     plt.figure(figsize=(20,10))
@@ -386,98 +836,99 @@ def check_uppercase(data):
     return new_data
 
 
-def word_associations_plot(load_association_list,title):
+def class_lexicon_stats(data, lexicons, text_column='message', class_column='sentiment'):
     '''
-    Function to plot the rate at which words from one list
-    appear in another list
+    Function to compute how often each lexicon shows up in each class
+    from a single document-term count matrix.
     
     Input
     -----
-    load_association_list : list (str)
+    data : Pandas Dataframe
+    lexicons : dict
+        Lexicon name to word list, multi-word entries allowed
+        Ex: {'News': load_news_words()}
     
     Optional Input
     --------------
-    None
+    text_column : str
+        Column holding the tweets
+    class_column : str
+        Column holding the class labels
         
     Output
     ------
-    Barplot of rate of words in given list
-    '''   
-    # Create dataframe subsets
-    anti = data[data.sentiment == -1]
-    neutral = data[data.sentiment == 0]
-    man = data[data.sentiment == 1]
-    news = data[data.sentiment == 2]
+    Tidy dataframe with one row per class and lexicon:
+        tweets - number of tweets in the class
+        entries_present - lexicon entries that appear at least once in the class
+        occurrences - total lexicon matches in the class
+        rate - entries_present per tweet, the value word_associations_plot draws
+        occurrences_per_tweet - occurrences per tweet
+    The input dataframe is not modified.
+    '''
+    from scipy import sparse
+    from sklearn.feature_extraction.text import CountVectorizer
     
-    # Set word list equal to loaded list
-    word_list = load_association_list
+    letters = re.compile(r'[a-zA-Z]+')
     
-    # Tokenize word_list
-    tokenizer = RegexpTokenizer(r'[a-zA-Z]+')
-    data.message = data.message.apply(lambda x: tokenizer.tokenize(x))
+    # entries are matched on whole lowercase words, the same way tweets are tokenized
+    entries = {name: sorted({' '.join(letters.findall(entry.lower())) for entry in words} - {''})
+               for name, words in lexicons.items()}
+    vocabulary = sorted(set(chain.from_iterable(entries.values())))
+    max_words = max([len(term.split()) for term in vocabulary] or [1])
+    vectorizer = CountVectorizer(vocabulary=vocabulary, token_pattern=r'[a-zA-Z]+',
+                                 ngram_range=(1, max_words))
+    term_counts = vectorizer.transform(data[text_column].astype(str))
     
-    # Lowercase word_list
-    data.message = data.message.apply(lambda x: lowercase(x))
+    # summing document rows into class rows with a sparse one-hot product
+    classes, codes = np.unique(data[class_column].values, return_inverse=True)
+    one_hot = sparse.csr_matrix((np.ones(len(codes), dtype=term_counts.dtype), (codes, np.arange(len(codes)))),
+                                shape=(len(classes), len(codes)))
+    class_counts = (one_hot @ term_counts).toarray()
+    tweets = np.bincount(codes, minlength=len(classes))
     
-    # Untokenizing data
-    data.message = data.message.apply(lambda x: ','.join(x))
-    data.message = data.message.apply(lambda x: x.replace(',',' '))
+    rows = []
+    for name, terms in entries.items():
+        columns = [vectorizer.vocabulary_[term] for term in terms]
+        lexicon_counts = class_counts[:, columns]
+        present = (lexicon_counts > 0).sum(axis=1)
+        occurrences = lexicon_counts.sum(axis=1)
+        for i, label in enumerate(classes):
+            rows.append({'class': label,
+                         'lexicon': name,
+                         'tweets': tweets[i],
+                         'entries_present': present[i],
+                         'occurrences': occurrences[i],
+                         'rate': present[i] / tweets[i],
+                         'occurrences_per_tweet': occurrences[i] / tweets[i]})
     
-    # Combing all text for each class
-    anti_full_text = " ".join(tweet for tweet in anti.message)
-    neutral_full_text = " ".join(tweet for tweet in neutral.message)
-    man_full_text = " ".join(tweet for tweet in man.message)
-    news_full_text = " ".join(tweet for tweet in news.message)
+    return pd.DataFrame(rows)
+
+def word_associations_plot(load_association_list,title):
+    '''
+    Function to plot the rate at which words from one list
+    appear in each class, drawn from class_lexicon_stats
     
-    # Anti class counter
-    words_anti = 0
+    Input
+    -----
+    load_association_list : list (str)
     
-    # Counting
-    for word in word_list:
-        if word in anti_full_text:
-            words_anti += 1
-            
-    # Rate for anti class
-    anti_word_rate = (words_anti / len(anti))
+    Optional Input
+    --------------
+    None
+        
+    Output
+    ------
+    Barplot of rate of words in given list
+    '''   
+    plt = set_plot_style()
+    import seaborn as sns
+    data = load_twitter_sentiment_data()
+    
+    # Rate for every class from one document-term matrix, data is left as is
+    stats = class_lexicon_stats(data, {title: load_association_list})
     
-    # Neutral class counter
-    words_neutral = 0
-
-    # Counting
-    for word in word_list:
-        if word in neutral_full_text:
-            words_neutral += 1
-
-    # Rate for neutral class
-    neutral_word_rate = (words_neutral / len(neutral))
-
-    # Man class counter
-    words_man = 0
-
-    # Counting
-    for word in word_list:
-        if word in man_full_text:
-            words_man += 1
-
-    # Rate for man class
-    man_word_rate = (words_man / len(man))
-
-    # News class counter
-    words_news = 0
-
-    # Counting
-    for word in word_list:
-        if word in news_full_text:
-            words_news += 1
-
-    # Rate for news class
-    news_word_rate = (words_news / len(news))
-
     # Defining y-values
-    word_rate = (anti_word_rate,
-                 neutral_word_rate,
-                 man_word_rate,
-                 news_word_rate)
+    word_rate = tuple(stats.rate)
     
     # Plotting bar graph
     plt.figure(figsize=(20,10))
@@ -529,13 +980,71 @@ def word_association_features(data, word_association_list):
     ------
     Count of how many words from data appear in word_association_list
     '''
+    # hashing the list once instead of scanning it for every word
+    word_association_set = set(word_association_list)
     count = 0
     for word in data:
-        if word in word_association_list:
+        if word in word_association_set:
             count += 1
     
     return count
 
+# (column name, element, kind) for the string features, in output order
+string_features = [('hyperlink_present', 'http', 'present'),
+                   ('retweet_present', 'RT', 'present'),
+                   ('mention_present', '@', 'present'),
+                   ('mention_count', '@', 'count'),
+                   ('hashtag_present', '#', 'present'),
+                   ('hashtag_count', '#', 'count'),
+                   ('exclamation_point', '!', 'present'),
+                   ('question_mark', '?', 'present'),
+                   ('dollar_sign', '$', 'present'),
+                   ('percent_symbol', '%', 'present'),
+                   ('colon', ':', 'present'),
+                   ('semi_colon', ';', 'present')]
+
+def custom_feature_frame(data, column='message', textblob=True):
+    '''
+    Function to build the simple custom features for a dataframe with
+    vectorized string operations and a single TextBlob parse per row.
+    
+    Input
+    -----
+    data : Pandas Dataframe
+    
+    Optional Input
+    --------------
+    column : str
+        Name of the text column
+        Ex: 'message'
+    textblob : bool
+        Whether to compute the textblob polarity and subjectivity scores
+        
+    Output
+    ------
+    New DataFrame on the same index with the columns listed in
+    simple_custom_features, stored as float32 (scores), int16 (length
+    and counts) and int8 (binaries). The input is left untouched.
+    '''
+    text = data[column]
+    features = pd.DataFrame(index=data.index)
+    
+    if textblob:
+        # parsing every tweet once and reading both scores off the result
+        from textblob import TextBlob
+        sentiments = [TextBlob(x).sentiment for x in text]
+        features['textblob_polarity'] = np.array([s.polarity for s in sentiments], dtype=np.float32)
+        features['textblob_subjectivity'] = np.array([s.subjectivity for s in sentiments], dtype=np.float32)
+    
+    features['tweet_length'] = text.str.len().astype(np.int16)
+    for name, element, kind in string_features:
+        if kind == 'count':
+            features[name] = text.str.count(re.escape(element)).astype(np.int16)
+        else:
+            features[name] = text.str.contains(element, regex=False).astype(np.int8)
+    
+    return features
+
 def simple_custom_features(data):
     
     '''
@@ -568,21 +1077,9 @@ def simple_custom_features(data):
         colon - binary for presence of colon in message column value
         semi_colon - binary for presence of semi-colon in message column value
     '''
-    data['textblob_polarity'] = data['message'].apply(lambda x: TextBlob(x).sentiment.polarity)                                                        
-    data['textblob_subjectivity'] = data['message'].apply(lambda x: TextBlob(x).sentiment.subjectivity)
-    data['tweet_length'] = data['message'].apply(lambda x: len(x))
-    data['hyperlink_present'] = data['message'].apply(lambda x: 1 if 'http' in x else 0)
-    data['retweet_present'] = data['message'].apply(lambda x: 1 if 'RT' in x else 0)
-    data['mention_present'] = data['message'].apply(lambda x: 1 if '@' in x else 0)
-    data['mention_count'] = data['message'].apply(lambda x: x.count('@'))
-    data['hashtag_present'] = data['message'].apply(lambda x: 1 if '#' in x else 0)
-    data['hashtag_count'] = data['message'].apply(lambda x: x.count('#'))
-    data['exclamation_point'] = data['message'].apply(lambda x: 1 if '!' in x else 0)
-    data['question_mark'] = data['message'].apply(lambda x: 1 if '?' in x else 0)
-    data['dollar_sign'] = data['message'].apply(lambda x: 1 if '$' in x else 0)
-    data['percent_symbol'] = data['message'].apply(lambda x: 1 if '%' in x else 0)
-    data['colon'] = data['message'].apply(lambda x: 1 if ':' in x else 0)
-    data['semi_colon'] = data['message'].apply(lambda x: 1 if ';' in x else 0)
+    features = custom_feature_frame(data, column='message')
+    for name in features.columns:
+        data[name] = features[name]
     
     return data.head()
 
@@ -711,3 +1208,187 @@ def load_tier1_words():
     
     return tier_one_words_list
 
+def predict_sentiment(texts, tfidf, model, batch_size=10000):
+    '''
+    Function to vectorize and predict tweets in row batches, passing the
+    sparse TF-IDF matrix straight to the classifier.
+    
+    Input
+    -----
+    texts : list (str) or Pandas Series (str)
+        Cleaned and lemmatized tweets
+    tfidf : fitted TfidfVectorizer
+    model : fitted classifier
+    
+    Optional Input
+    --------------
+    batch_size : int
+        Number of tweets transformed and predicted at a time
+        Ex: 10000
+        
+    Output
+    ------
+    Numpy array of predictions in the same order as texts
+    '''
+    texts = list(texts)
+    predictions = []
+    for start in range(0, len(texts), batch_size):
+        batch_texts = texts[start:start + batch_size]
+        with metrics.stage('vectorize', rows=len(batch_texts)):
+            # CSR matrix, no dense or per-column DataFrame copy
+            batch = tfidf.transform(batch_texts)
+        with metrics.stage('predict', rows=len(batch_texts)):
+            predictions.append(model.predict(batch))
+    
+    if not predictions:
+        return np.array([])
+    return np.concatenate(predictions)
+
+def predict_unique_sentiment(texts, tfidf, model, n_jobs=1, lemmatize=True):
+    '''
+    Function to score each distinct cleaned tweet once and broadcast the
+    predictions back to every row, so retweets and syndicated headlines
+    are only lemmatized, vectorized and predicted one time.
+    
+    Input
+    -----
+    texts : list (str) or Pandas Series (str)
+        Cleaned tweets
+    tfidf : fitted TfidfVectorizer
+    model : fitted classifier
+    
+    Optional Input
+    --------------
+    n_jobs : int
+        Number of processes used for lemmatizing
+    lemmatize : bool
+        Whether texts still need to go through lemmatize_tweet
+        
+    Output
+    ------
+    Numpy array of predictions in the same order as texts, and a
+    dictionary with rows, unique_texts and dedup_ratio (share of rows
+    that did not need scoring)
+    '''
+    # factorize hashes every text once and maps each row to its unique text
+    codes, uniques = pd.factorize(pd.Series(texts, dtype=object).astype(str))
+    unique_texts = pd.Series(uniques)
+    if lemmatize:
+        unique_texts = preprocess_corpus(unique_texts, n_jobs=n_jobs, clean=False)
+    unique_predictions = predict_sentiment(unique_texts, tfidf, model)
+    
+    rows = len(codes)
+    report = {'rows': rows,
+              'unique_texts': len(uniques),
+              'dedup_ratio': 1 - len(uniques) / rows if rows else 0.0}
+    
+    return unique_predictions[codes] if rows else unique_predictions, report
+
+# bump when the layout of the saved model bundle changes
+bundle_format_version = 1
+
+def load_model_bundle(path=model_bundle_path):
+    '''
+    Function to load the fitted TF-IDF vectorizer and classifier saved
+    by save_model_bundle.
+    
+    Input
+    -----
+    None
+    
+    Optional Input
+    --------------
+    path : str
+        Location of the bundle, defaults to building_classifier/model_bundle.pickle
+        
+    Output
+    ------
+    Dictionary with tfidf, model, format_version, sklearn_version and
+    created keys
+    '''
+    with open(path, 'rb') as f:
+        bundle = pickle.load(f)
+    
+    if bundle.get('format_version') != bundle_format_version:
+        raise ValueError('{} has bundle format version {}, expected {}'.format(
+            path, bundle.get('format_version'), bundle_format_version))
+    
+    import sklearn
+    if bundle['sklearn_version'] != sklearn.__version__:
+        warnings.warn('{} was saved with scikit-learn {} but {} is installed'.format(
+            path, bundle['sklearn_version'], sklearn.__version__))
+    
+    return bundle
+
+def save_model_bundle(tfidf, model, path=model_bundle_path):
+    '''
+    Function to save a fitted TF-IDF vectorizer and classifier together
+    so scoring jobs do not have to refit the vectorizer.
+    
+    Input
+    -----
+    tfidf : fitted TfidfVectorizer
+    model : fitted classifier
+    
+    Optional Input
+    --------------
+    path : str
+        Location of the bundle, defaults to building_classifier/model_bundle.pickle
+        
+    Output
+    ------
+    Dictionary that was written to path
+    '''
+    import sklearn
+    
+    # stop_words_ only documents terms dropped during fitting and is not
+    # needed for transform, so it is left out to keep the file small
+    if hasattr(tfidf, 'stop_words_'):
+        tfidf = copy.copy(tfidf)
+        del tfidf.stop_words_
+    
+    bundle = {'format_version': bundle_format_version,
+              'sklearn_version': sklearn.__version__,
+              'created': datetime.now(timezone.utc).isoformat(),
+              'tfidf': tfidf,
+              'model': model}
+    with open(path, 'wb') as f:
+        pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    return bundle
+
+def build_model_bundle(model_path=best_model_path, train_path=prepared_data_path, path=model_bundle_path):
+    '''
+    Function to create the model bundle from an existing best_model.pickle
+    by fitting the TF-IDF vectorizer on the prepared training data one
+    last time, the same way the data_prep notebooks used to.
+    
+    Input
+    -----
+    None
+    
+    Optional Input
+    --------------
+    model_path : str
+        Location of the pickled classifier
+    train_path : str
+        Location of prepared_twitter_sentiment_data.csv
+    path : str
+        Location the bundle is written to
+        
+    Output
+    ------
+    Dictionary that was written to path
+    '''
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    
+    train_data = read_table(train_path, columns=['message'])
+    # Drop 31 rows with missing message column
+    train_data.dropna(inplace=True)
+    tfidf = TfidfVectorizer(ngram_range=(1,1))
+    tfidf.fit(train_data.message)
+    
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    
+    return save_model_bundle(tfidf, model, path)
@@ -0,0 +1,228 @@
+'''
+Batch scorer for tweet shards. Every shard matching the input globs is
+cleaned, lemmatized, vectorized and predicted with the saved model bundle
+and written to the output directory with a sentiment column added.
+
+Each finished shard is recorded in manifest.csv in the output directory,
+along with the size and modification time of the file it was read from,
+its Parquet copy when that is up to date and the csv otherwise. A rerun
+skips shards that are already done and unchanged. A shard that fails is
+recorded as failed and the run moves on, so rerunning the same command
+only redoes the failed or changed shards.
+
+Usage
+-----
+python score_shards.py 'applying_classifier/time_series/data/raw_data/daily_tweets/tweets_*.csv' --output-dir scored/daily
+python score_shards.py 'applying_classifier/location/data/raw_data/date_tweets_day_*.csv' --output-dir scored/location --n-jobs 8
+'''
+import argparse
+import csv
+import glob
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from functions import read_table, fresh_columnar_path, clean_tweet, predict_unique_sentiment, load_model_bundle, model_bundle_path
+
+manifest_columns = ['shard', 'output', 'input_size', 'input_mtime', 'rows', 'unique_texts', 'seconds',
+                    'status', 'error', 'finished']
+
+# text column names used by the collected shards, in order of preference
+text_columns = ['tweet', 'text', 'message']
+
+def natural_key(path):
+    '''
+    Function to order paths by the numbers in their file name so
+    tweets_2010_2 comes before tweets_2010_10.
+    '''
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', path)]
+
+def find_shards(patterns):
+    '''
+    Function to expand the input globs into a sorted list of distinct
+    shard paths.
+    '''
+    paths = {os.path.abspath(path) for pattern in patterns for path in glob.glob(pattern)}
+    return sorted(paths, key=natural_key)
+
+def input_signature(path):
+    '''
+    Function to describe the state of an input shard, so a shard that
+    changed after it was scored is scored again. The file read_table
+    reads is described, so a new or stale Parquet copy counts as a change.
+    '''
+    stat = os.stat(fresh_columnar_path(path) or path)
+    return stat.st_size, int(stat.st_mtime)
+
+def read_manifest(output_dir):
+    '''
+    Function to read the manifest of earlier runs, the latest attempt of
+    each shard last.
+    '''
+    path = os.path.join(output_dir, 'manifest.csv')
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=manifest_columns)
+    return pd.read_csv(path, keep_default_na=False)
+
+def completed_shards(output_dir):
+    '''
+    Function to find the shards whose latest attempt is done, whose
+    output still exists and whose input has not changed since.
+
+    Input
+    -----
+    output_dir : str
+
+    Output
+    ------
+    Set of shard paths
+    '''
+    latest = read_manifest(output_dir).drop_duplicates('shard', keep='last')
+    done = set()
+    for row in latest[latest.status == 'done'].itertuples():
+        if (os.path.exists(row.shard) and os.path.exists(os.path.join(output_dir, row.output))
+                and input_signature(row.shard) == (int(row.input_size), int(row.input_mtime))):
+            done.add(row.shard)
+    return done
+
+def output_name(path):
+    '''
+    Function to name the scored copy of a shard, keeping the parent folder
+    so shards with the same file name from different globs do not clash.
+    '''
+    parent = os.path.basename(os.path.dirname(path))
+    return '{}__{}.csv'.format(parent, os.path.splitext(os.path.basename(path))[0])
+
+def score_shard(path, output_path, tfidf, model, text_column=None, n_jobs=1):
+    '''
+    Function to clean, lemmatize, vectorize and predict one shard and
+    write it with a sentiment column. The output is written to a
+    temporary file first and renamed, so a crash never leaves a partial
+    output behind.
+
+    Input
+    -----
+    path : str
+    output_path : str
+    tfidf : fitted TfidfVectorizer
+    model : fitted classifier
+
+    Optional Input
+    --------------
+    text_column : str
+        Column holding the tweet, found from text_columns when None
+    n_jobs : int
+        Number of processes used for lemmatizing
+
+    Output
+    ------
+    Dictionary with rows and unique_texts
+    '''
+    frame = read_table(path, index_col=0, lineterminator='\n')
+    if text_column is None:
+        text_column = next((column for column in text_columns if column in frame), None)
+        if text_column is None:
+            raise KeyError('none of {} in {}'.format(text_columns, list(frame.columns)))
+
+    cleaned = frame[text_column].astype(str).map(clean_tweet)
+    # lemmatizing and predicting each distinct text once
+    predictions, report = predict_unique_sentiment(cleaned, tfidf, model, n_jobs=n_jobs)
+    frame['sentiment'] = predictions.astype(np.int8) if len(frame) else predictions
+
+    frame.to_csv(output_path + '.tmp')
+    os.replace(output_path + '.tmp', output_path)
+    return report
+
+def score_shards(paths, bundle, output_dir, text_column=None, n_jobs=1, fail_fast=False, verbose=True):
+    '''
+    Function to score every shard not already done, appending one
+    manifest row per attempted shard as soon as it finishes.
+
+    Input
+    -----
+    paths : list (str)
+    bundle : dict
+        Ex: load_model_bundle()
+    output_dir : str
+
+    Optional Input
+    --------------
+    text_column : str
+    n_jobs : int
+    fail_fast : bool
+        Whether to stop at the first failed shard instead of moving on
+    verbose : bool
+
+    Output
+    ------
+    Dataframe of the manifest rows written by this run
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    done = completed_shards(output_dir)
+    pending = [path for path in paths if path not in done]
+    if verbose:
+        print('{} shards, {} already scored, {} to go'.format(len(paths), len(paths) - len(pending), len(pending)))
+
+    manifest_path = os.path.join(output_dir, 'manifest.csv')
+    write_header = not os.path.exists(manifest_path)
+    rows = []
+    with open(manifest_path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=manifest_columns)
+        if write_header:
+            writer.writeheader()
+        for i, path in enumerate(pending, 1):
+            output = output_name(path)
+            size, mtime = input_signature(path)
+            start = time.perf_counter()
+            row = {'shard': path, 'output': output, 'input_size': size, 'input_mtime': mtime}
+            try:
+                report = score_shard(path, os.path.join(output_dir, output), bundle['tfidf'], bundle['model'],
+                                     text_column, n_jobs)
+                row.update(rows=report['rows'], unique_texts=report['unique_texts'], status='done', error='')
+            except Exception as e:
+                row.update(rows=0, unique_texts=0, status='failed', error='{}: {}'.format(type(e).__name__, e))
+            row.update(seconds=round(time.perf_counter() - start, 2),
+                       finished=datetime.now(timezone.utc).isoformat())
+            writer.writerow(row)
+            f.flush()
+            rows.append(row)
+
+            if verbose:
+                detail = '{} rows'.format(row['rows']) if row['status'] == 'done' else row['error']
+                print('[{}/{}] {} {} in {}s, {}'.format(i, len(pending), os.path.basename(path), row['status'],
+                                                      row['seconds'], detail))
+            if fail_fast and row['status'] == 'failed':
+                break
+
+    return pd.DataFrame(rows, columns=manifest_columns)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='glob patterns of input shards, quoted')
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--bundle', default=model_bundle_path, help='model bundle written by save_model_bundle')
+    parser.add_argument('--text-column', help='defaults to the first of {} in each shard'.format(', '.join(text_columns)))
+    parser.add_argument('--n-jobs', type=int, default=1, help='processes used for lemmatizing, -1 for every core')
+    parser.add_argument('--fail-fast', action='store_true', help='stop at the first failed shard')
+    args = parser.parse_args()
+
+    paths = find_shards(args.inputs)
+    if not paths:
+        sys.exit('no shards match {}'.format(' '.join(args.inputs)))
+    try:
+        bundle = load_model_bundle(args.bundle)
+    except FileNotFoundError:
+        sys.exit('{} not found, create it with build_model_bundle() first'.format(args.bundle))
+
+    rows = score_shards(paths, bundle, args.output_dir, args.text_column, args.n_jobs, args.fail_fast)
+    failed = (rows.status == 'failed').sum()
+    print('{} shards scored, {} failed'.format((rows.status == 'done').sum(), failed))
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+'''
+Local HTTP scoring service for the saved sentiment classifier. The fitted
+TF-IDF vectorizer and classifier are loaded once from the model bundle,
+and concurrent requests are gathered into micro-batches so the sparse
+transform and predict run vectorized over many tweets at a time.
+
+Endpoints
+---------
+POST /classify  {"text": "..."} or {"texts": ["...", ...]}
+    Returns {"sentiment": [...], "labels": [...]} in request order
+GET /stats
+    Returns p50/p99 latency, throughput and batch sizes
+GET /health
+
+Usage
+-----
+python scoring_server.py
+python scoring_server.py --port 8080 --max-batch-size 512 --max-wait-ms 5
+curl -X POST localhost:8000/classify -d '{"texts": ["climate change is real"]}'
+'''
+import argparse
+import collections
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from functions import clean_tweet, predict_unique_sentiment, load_model_bundle, model_bundle_path, class_labels
+
+class LatencyStats:
+    '''
+    Class that records request latencies and batch sizes from several
+    threads and summarizes them.
+
+    Input
+    -----
+    None
+
+    Optional Input
+    --------------
+    window : int
+        Number of most recent requests the latency percentiles cover
+
+    Output
+    ------
+    Object whose snapshot method returns the current summary
+    '''
+    def __init__(self, window=100000):
+        self.lock = threading.Lock()
+        self.latencies = collections.deque(maxlen=window)
+        self.started = time.monotonic()
+        self.requests = 0
+        self.tweets = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_tweets = 0
+
+    def record_request(self, seconds, n_tweets, error=False):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.requests += 1
+            self.tweets += n_tweets
+            self.errors += error
+
+    def record_batch(self, n_tweets):
+        with self.lock:
+            self.batches += 1
+            self.batched_tweets += n_tweets
+
+    def snapshot(self):
+        '''
+        Function to summarize the requests served so far.
+
+        Output
+        ------
+        Dictionary with latency percentiles in milliseconds, request and
+        tweet throughput per second and the mean batch size
+        '''
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            elapsed = time.monotonic() - self.started
+            summary = {'requests': self.requests,
+                       'tweets': self.tweets,
+                       'errors': self.errors,
+                       'batches': self.batches,
+                       'mean_batch_size': round(self.batched_tweets / self.batches, 1) if self.batches else 0.0,
+                       'uptime_seconds': round(elapsed, 1),
+                       'requests_per_second': round(self.requests / elapsed, 1),
+                       'tweets_per_second': round(self.tweets / elapsed, 1)}
+        for name, q in [('p50_ms', 50), ('p99_ms', 99)]:
+            summary[name] = round(float(np.percentile(latencies, q)), 2) if len(latencies) else None
+        return summary
+
+class MicroBatcher:
+    '''
+    Class that gathers the texts of concurrent requests and scores them
+    together on one background thread. A batch is scored as soon as it
+    holds max_batch_size tweets or max_wait_ms has passed since its first
+    request arrived.
+
+    Input
+    -----
+    score : callable
+        Takes a list of texts and returns a numpy array of predictions
+
+    Optional Input
+    --------------
+    max_batch_size : int
+    max_wait_ms : float
+    stats : LatencyStats
+
+    Output
+    ------
+    Object whose submit method returns a Future of the predictions
+    '''
+    def __init__(self, score, max_batch_size=256, max_wait_ms=5, stats=None):
+        self.score = score
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = stats
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, texts):
+        future = Future()
+        self.queue.put((texts, future))
+        return future
+
+    def next_batch(self):
+        '''
+        Function to block until a request arrives, then collect more until
+        the batch is full or the wait runs out.
+        '''
+        batch = [self.queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                predictions = self.score(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            if self.stats is not None:
+                self.stats.record_batch(len(texts))
+            start = 0
+            for request_texts, future in batch:
+                future.set_result(predictions[start:start + len(request_texts)])
+                start += len(request_texts)
+
+def bundle_scorer(bundle, preprocess=True):
+    '''
+    Function to build the scoring function the batcher calls.
+
+    Input
+    -----
+    bundle : dict
+        Ex: load_model_bundle()
+
+    Optional Input
+    --------------
+    preprocess : bool
+        Whether incoming texts are raw tweets that still need clean_tweet
+        and lemmatize_tweet, False when callers send prepared text
+
+    Output
+    ------
+    Callable taking a list of texts and returning a numpy array of
+    predictions
+    '''
+    tfidf, model = bundle['tfidf'], bundle['model']
+
+    def score(texts):
+        if preprocess:
+            texts = [clean_tweet(text) for text in texts]
+        # retweets sent in the same batch are only scored once
+        predictions, _ = predict_unique_sentiment(texts, tfidf, model, lemmatize=preprocess)
+        return predictions
+    return score
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    '''
+    Request handler for the scoring server. The server object carries the
+    batcher, stats, labels and request timeout.
+    '''
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok'})
+        elif self.path == '/stats':
+            self.send_json(200, self.server.stats.snapshot())
+        else:
+            self.send_json(404, {'error': 'unknown path {}'.format(self.path)})
+
+    def do_POST(self):
+        if self.path != '/classify':
+            self.send_json(404, {'error': 'unknown path {}'.format(self.path)})
+            return
+        start = time.monotonic()
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            texts = [body['text']] if 'text' in body else body['texts']
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise TypeError('texts must be a list of strings')
+        except (ValueError, KeyError, TypeError) as e:
+            self.server.stats.record_request(time.monotonic() - start, 0, error=True)
+            self.send_json(400, {'error': 'expected {{"text": str}} or {{"texts": [str]}}: {}'.format(e)})
+            return
+
+        try:
+            predictions = self.server.batcher.submit(texts).result(timeout=self.server.timeout_seconds) if texts else []
+        except Exception as e:
+            self.server.stats.record_request(time.monotonic() - start, len(texts), error=True)
+            self.send_json(500, {'error': '{}: {}'.format(type(e).__name__, e)})
+            return
+
+        sentiment = [int(x) for x in predictions]
+        self.send_json(200, {'sentiment': sentiment, 'labels': [self.server.labels.get(x) for x in sentiment]})
+        self.server.stats.record_request(time.monotonic() - start, len(texts))
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class ScoringServer(ThreadingHTTPServer):
+    # the default backlog of 5 drops connections under concurrent load
+    request_queue_size = 128
+    daemon_threads = True
+
+def make_server(bundle, host='127.0.0.1', port=8000, max_batch_size=256, max_wait_ms=5, preprocess=True,
+                timeout_seconds=30, verbose=False):
+    '''
+    Function to build a scoring server without starting it.
+
+    Input
+    -----
+    bundle : dict
+        Ex: load_model_bundle()
+
+    Optional Input
+    --------------
+    host : str
+        Defaults to localhost only
+    port : int
+        0 picks a free port
+    max_batch_size : int
+        Number of tweets that triggers a batch without waiting
+    max_wait_ms : float
+        Longest a request waits for others to join its batch
+    preprocess : bool
+        Whether to clean and lemmatize incoming texts
+    timeout_seconds : float
+        Longest a request waits for its predictions
+    verbose : bool
+        Whether to log every request
+
+    Output
+    ------
+    ScoringServer, call serve_forever to start it
+    '''
+    server = ScoringServer((host, port), ScoringHandler)
+    server.stats = LatencyStats()
+    server.batcher = MicroBatcher(bundle_scorer(bundle, preprocess), max_batch_size, max_wait_ms, server.stats)
+    # the labeled data uses -1 to 2 for anti, neutral, man-made and news
+    server.labels = {int(x): label for x, label in zip(sorted(bundle['model'].classes_), class_labels)}
+    server.timeout_seconds = timeout_seconds
+    server.verbose = verbose
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--bundle', default=model_bundle_path, help='model bundle written by save_model_bundle')
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    parser.add_argument('--no-preprocess', action='store_true', help='texts are already cleaned and lemmatized')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    try:
+        bundle = load_model_bundle(args.bundle)
+    except FileNotFoundError:
+        sys.exit('{} not found, create it with build_model_bundle() first'.format(args.bundle))
+
+    server = make_server(bundle, args.host, args.port, args.max_batch_size, args.max_wait_ms,
+                         not args.no_preprocess, verbose=args.verbose)
+    print('scoring on http://{}:{}/classify'.format(*server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats.snapshot(), indent=1))
+
+if __name__ == '__main__':
+    main()
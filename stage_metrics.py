@@ -0,0 +1,194 @@
+'''
+Opt-in timing and memory metrics for the pipeline stages. Every function
+module imports the one metrics recorder defined here, so a notebook that
+imports several of them still writes a single log.
+
+Set the SENTIMENT_METRICS environment variable to the path of a JSON lines
+log before importing, or call metrics.enable(path), to turn it on.
+'''
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from functools import wraps
+
+import pandas as pd
+
+class StageMetrics:
+    '''
+    Class that records wall time, CPU time, row counts and tracemalloc
+    peak for pipeline stages and writes one JSON line per stage to a
+    metrics log. Disabled unless the SENTIMENT_METRICS environment
+    variable names the log file or enable() is called.
+
+    Input
+    -----
+    None
+
+    Optional Input
+    --------------
+    path : str
+        Location of the JSON lines log, None leaves metrics disabled
+    trace_memory : bool
+        Whether to measure the tracemalloc peak, which slows allocation
+        heavy stages down while it is on
+
+    Output
+    ------
+    Object with a stage context manager and an instrument decorator
+    '''
+    def __init__(self, path=None, trace_memory=True):
+        self.records = []
+        self.calls = {}
+        self.stack = []
+        self.disable()
+        if path:
+            self.enable(path, trace_memory)
+
+    def enable(self, path, trace_memory=True):
+        self.path = path
+        self.trace_memory = trace_memory
+        self.enabled = True
+
+    def disable(self):
+        self.path = None
+        self.trace_memory = False
+        self.enabled = False
+
+    def stage(self, name, rows=None):
+        '''
+        Function to measure the block of a with statement as one stage.
+        When disabled the returned context manager does nothing.
+        
+        Input
+        -----
+        name : str
+            Ex: 'predict'
+        
+        Optional Input
+        --------------
+        rows : int
+            Number of rows the stage processes, can also be set on the
+        dictionary the with statement returns
+            
+        Output
+        ------
+        Context manager returning the stage's record dictionary
+        '''
+        if not self.enabled:
+            return null_stage
+        return self.measure(name, rows)
+
+    @contextmanager
+    def measure(self, name, rows):
+        import tracemalloc
+        
+        frame = {'peak': 0}
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            if self.stack:
+                # keep the enclosing stage's peak before resetting it
+                parent = self.stack[-1]
+                parent['peak'] = max(parent['peak'], tracemalloc.get_traced_memory()[1])
+            frame['start_memory'] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.stack.append(frame)
+        record = {'stage': name, 'rows': rows}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            self.stack.pop()
+            record.update(wall_seconds=round(wall, 6), cpu_seconds=round(cpu, 6))
+            if self.trace_memory:
+                peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                record['peak_mb'] = round((peak - frame['start_memory']) / 1e6, 3)
+                if self.stack:
+                    self.stack[-1]['peak'] = max(self.stack[-1]['peak'], peak)
+            self.write(record)
+
+    def iterate(self, name, iterable):
+        '''
+        Function to measure how long each item of an iterable, such as a
+        chunked csv reader, takes to produce, with len(item) as its rows.
+        When disabled the iterable is returned unchanged.
+        '''
+        if not self.enabled:
+            return iterable
+        return self.measure_items(name, iter(iterable))
+
+    def measure_items(self, name, items):
+        while True:
+            with self.measure(name, None) as record:
+                item = next(items, None)
+                record['rows'] = None if item is None else len(item)
+            if item is None:
+                return
+            yield item
+
+    def instrument(self, name):
+        '''
+        Decorator for functions called once per row, such as clean_tweet.
+        Calls are only counted and timed, and are written to the log by
+        flush(). The function is returned unchanged when metrics are
+        disabled at import time, so it costs nothing then.
+        '''
+        def decorator(function):
+            if not self.enabled:
+                return function
+            totals = self.calls.setdefault(name, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+            
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                wall, cpu = time.perf_counter(), time.process_time()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    totals['calls'] += 1
+                    totals['wall_seconds'] += time.perf_counter() - wall
+                    totals['cpu_seconds'] += time.process_time() - cpu
+            return wrapper
+        return decorator
+
+    def flush(self):
+        '''
+        Function to write and reset the per-row call totals.
+        '''
+        for name, totals in self.calls.items():
+            if totals['calls']:
+                self.write({'stage': name, 'rows': totals['calls'],
+                            'wall_seconds': round(totals['wall_seconds'], 6),
+                            'cpu_seconds': round(totals['cpu_seconds'], 6)})
+            totals.update(calls=0, wall_seconds=0.0, cpu_seconds=0.0)
+
+    def write(self, record):
+        record = dict(record, time=datetime.now(timezone.utc).isoformat(), pid=os.getpid())
+        self.records.append(record)
+        if self.path:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def summary(self):
+        '''
+        Function to total the stages recorded by this process.
+        
+        Output
+        ------
+        Dataframe indexed by stage with runs, rows, wall_seconds,
+        cpu_seconds, rows_per_second and the largest peak_mb
+        '''
+        self.flush()
+        records = pd.DataFrame(self.records, columns=['stage', 'rows', 'wall_seconds', 'cpu_seconds', 'peak_mb'])
+        summary = records.groupby('stage', sort=False).agg(runs=('stage', 'size'), rows=('rows', 'sum'),
+                                                           wall_seconds=('wall_seconds', 'sum'),
+                                                           cpu_seconds=('cpu_seconds', 'sum'),
+                                                           peak_mb=('peak_mb', 'max'))
+        summary['rows_per_second'] = summary.rows / summary.wall_seconds
+        return summary
+
+# returned by StageMetrics.stage while disabled, writes to it are ignored
+null_stage = nullcontext({})
+metrics = StageMetrics(os.environ.get('SENTIMENT_METRICS'))
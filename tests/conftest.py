@@ -0,0 +1,11 @@
+import os
+import sys
+
+# the function modules are imported from the repository root and their folders
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ['', 'building_classifier', os.path.join('applying_classifier', 'location', 'data'),
+               os.path.join('applying_classifier', 'time_series', 'data'),
+               os.path.join('applying_classifier', 'time_series', 'data', 'raw_data', 'daily_tweets')]:
+    path = os.path.join(repo_dir, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
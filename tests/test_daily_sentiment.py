@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+import time_series_functions
+from time_series_functions import daily_sentiment_totals, DailySentimentAggregator
+
+texts = ['good day for the climate', 'bad storm again', 'new climate report', 'great news', 'awful heat']
+labels = [1, -1, 2, 1, -1]
+
+@pytest.fixture
+def model(monkeypatch):
+    # the WordNet data is not needed to test the counting
+    monkeypatch.setattr(time_series_functions.lemmatization_engine, 'lemmatize', lambda text: text)
+    tfidf = TfidfVectorizer().fit(texts)
+    return tfidf, LogisticRegression().fit(tfidf.transform(texts), labels)
+
+def write_shards(directory, with_ids=True):
+    rng = np.random.default_rng(0)
+    days = pd.date_range('2020-01-01', periods=6).repeat(8)
+    tweets = pd.DataFrame({'id': np.arange(len(days)) + 1000,
+                           'date': (days + pd.to_timedelta(rng.integers(0, 86400, len(days)), 's')).astype(str),
+                           'tweet': rng.choice(texts, len(days)),
+                           'username': 'someone'})
+    # two different tweets posted with the same text at the same second
+    tweets.loc[1, ['date', 'tweet']] = tweets.loc[0, ['date', 'tweet']].values
+    # the search windows overlap, so the second shard repeats the end of the first
+    shards = [tweets.iloc[:30], tweets.iloc[24:]]
+    for i, shard in enumerate(shards, 1):
+        shard = shard if with_ids else shard.drop(columns='id')
+        shard.reset_index(drop=True).to_csv(directory / 'tweets_{}.csv'.format(i))
+    return tweets, str(directory / 'tweets_*.csv')
+
+def test_totals_do_not_depend_on_chunk_size(tmp_path, model):
+    tweets, pattern = write_shards(tmp_path)
+    totals = [daily_sentiment_totals(*model, pattern=pattern, chunk_size=chunk_size, verbose=False)
+              for chunk_size in [1, 7, 50000]]
+    for other in totals[1:]:
+        pd.testing.assert_frame_equal(totals[0], other)
+    # tweets with the same text on the same day are all counted, repeats of one id once
+    assert totals[0]['count'].tolist() == [8] * 6
+
+def test_shards_without_ids_count_every_row(tmp_path, model):
+    tweets, pattern = write_shards(tmp_path, with_ids=False)
+    totals = daily_sentiment_totals(*model, pattern=pattern, chunk_size=7, verbose=False)
+    assert totals['count'].sum() == 54
+
+def test_aggregator_matches_totals(tmp_path, model):
+    tweets, pattern = write_shards(tmp_path)
+    state = tmp_path / 'state'
+    state.mkdir()
+    aggregator = DailySentimentAggregator(str(state))
+    for i in [2, 1]:
+        aggregator.ingest(*model, pattern=str(tmp_path / 'tweets_{}.csv'.format(i)), chunk_size=7)
+    expected = daily_sentiment_totals(*model, pattern=pattern, verbose=False)
+    np.testing.assert_array_equal(aggregator.totals['count'], expected['count'])
+    np.testing.assert_array_equal(aggregator.totals['sum'], expected['sum'])
+    # the ids counted so far survive a restart
+    assert len(DailySentimentAggregator(str(state)).seen_ids) == len(tweets)
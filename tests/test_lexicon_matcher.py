@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from building_classifier_functions import LexiconMatcher, TokenCorpus
+
+lexicons = {'climate': ['temperature', 'temperature change', 'sea level rise', 'global mean sea level'],
+            'news': ['report', 'breaking news', 'new report', 'new climate report']}
+
+def test_phrase_at_end_of_tweet_counted_once():
+    matcher = LexiconMatcher(lexicons, phrases=True)
+    # 'temperature change' ends the tweet, where the longer phrase lengths run past it
+    assert matcher.count(['record', 'temperature', 'change']) == [2, 0]
+    assert matcher.count(['read', 'the', 'new', 'report']) == [0, 2]
+    assert matcher.count(['breaking', 'news']) == [0, 1]
+
+def test_phrase_count_matches_corpus_count():
+    rng = np.random.default_rng(0)
+    words = ['temperature', 'change', 'sea', 'level', 'rise', 'global', 'mean', 'new', 'climate',
+             'report', 'breaking', 'news', 'the', 'is']
+    tweets = pd.Series([' '.join(rng.choice(words, rng.integers(0, 8))) for _ in range(2000)])
+    matcher = LexiconMatcher(lexicons, phrases=True)
+    expected = np.array([matcher.count(tweet.split()) for tweet in tweets]).reshape(len(tweets), 2)
+    assert (matcher.count_corpus(TokenCorpus.from_texts(tweets)) == expected).all()
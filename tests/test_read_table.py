@@ -0,0 +1,30 @@
+import os
+
+import pandas as pd
+
+from functions import read_table, fresh_columnar_path, columnar_path
+
+def write_files(tmp_path, csv_mtime, parquet_mtime):
+    path = str(tmp_path / 'tweets.csv')
+    pd.DataFrame({'date': ['2020-01-01'], 'tweet': ['updated']}).to_csv(path)
+    # a placeholder copy, a stale one must never be opened
+    with open(columnar_path(path), 'w') as f:
+        f.write('not parquet')
+    os.utime(path, (csv_mtime, csv_mtime))
+    os.utime(columnar_path(path), (parquet_mtime, parquet_mtime))
+    return path
+
+def test_copy_newer_than_csv_is_used(tmp_path):
+    path = write_files(tmp_path, csv_mtime=1000, parquet_mtime=2000)
+    assert fresh_columnar_path(path) == columnar_path(path)
+
+def test_csv_newer_than_copy_is_read(tmp_path):
+    path = write_files(tmp_path, csv_mtime=2000, parquet_mtime=1000)
+    assert fresh_columnar_path(path) is None
+    frame = read_table(path, columns=['tweet'], index_col=0)
+    assert frame.tweet.tolist() == ['updated']
+
+def test_no_copy(tmp_path):
+    path = str(tmp_path / 'tweets.csv')
+    pd.DataFrame({'tweet': ['a']}).to_csv(path)
+    assert fresh_columnar_path(path) is None
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from location_functions import resolve_states, find_us, try_split, lowercase
+
+def old_chain(location):
+    '''
+    The state the notebook's split, lowercase and find_us chain gave a
+    location, None for the rows it dropped.
+    '''
+    state = find_us(lowercase(try_split(str(location))))
+    if state == 'not':
+        return None
+    state = state.replace('not', '')
+    state = state[-2:] if len(state) > 2 else state
+    return state.upper() or None
+
+# locations the old chain resolved, which must keep their state
+old_locations = ['austin tx', 'Austin TX', 'kansas city mo', 'New York NY', 'dc', 'in', 'me', 'ok',
+                 'Portland or', 'washington dc', 'la']
+
+# locations the resolver reads that the old chain dropped
+new_locations = {'Austin, TX': 'TX', 'Austin, TX, USA': 'TX', 'Texas': 'TX', 'Texas, USA': 'TX',
+                 'West Virginia': 'WV', 'seattle, washington': 'WA', 'Washington, DC': 'DC',
+                 'Portland, OR, United States of America': 'OR', 'Maine, USA': 'ME'}
+
+# locations neither should read as a state
+no_state = ['Made in USA', 'Born in USA', 'Me, USA', 'Washington', 'Washington, USA', 'Oh, USA',
+            'somewhere in the world', 'USA', 'nan', '']
+
+def test_old_chain_states_kept():
+    expected = [old_chain(location) for location in old_locations]
+    assert None not in expected
+    assert resolve_states(pd.Series(old_locations)).astype(object).tolist() == expected
+
+def test_new_states():
+    locations = pd.Series(list(new_locations))
+    assert resolve_states(locations).astype(object).tolist() == list(new_locations.values())
+
+def test_country_suffix_does_not_make_a_match():
+    assert all(old_chain(location) is None for location in no_state)
+    assert resolve_states(pd.Series(no_state)).isna().all()
+
+def test_missing_locations():
+    states = resolve_states(pd.Series(['Austin, TX', np.nan, None], index=[5, 6, 7]))
+    assert states.index.tolist() == [5, 6, 7]
+    assert states.astype(object).tolist()[0] == 'TX' and states.iloc[1:].isna().all()
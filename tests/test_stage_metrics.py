@@ -0,0 +1,20 @@
+import json
+
+import functions
+import location_functions
+from stage_metrics import metrics
+
+def test_function_modules_share_one_recorder():
+    assert functions.metrics is metrics
+    assert location_functions.metrics is metrics
+
+def test_stage_written_once(tmp_path):
+    path = tmp_path / 'metrics.jsonl'
+    metrics.enable(str(path), trace_memory=False)
+    try:
+        with location_functions.metrics.stage('resolve_states', rows=3):
+            pass
+    finally:
+        metrics.disable()
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(record['stage'], record['rows']) for record in records] == [('resolve_states', 3)]
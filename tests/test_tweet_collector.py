@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+
+from tweet_collector import FrameBackend, TwintBackend, collect_tweets, read_manifest
+
+windows = [('2020-01-0{}'.format(day), '2020-01-0{}'.format(day + 1)) for day in range(1, 5)]
+
+# stands in for twint, keeping the last search in module level storage
+fake_twint = '''
+import time, types
+import pandas as pd
+
+class Config:
+    pass
+
+def search(c):
+    storage.panda.Tweets_df = pd.DataFrame({'id': [int(c.Until.replace('-', ''))], 'date': [c.Until],
+                                            'tweet': [c.Search], 'username': ['someone']})
+    time.sleep(0.2)
+
+storage = types.SimpleNamespace(panda=types.SimpleNamespace(Tweets_df=None))
+run = types.SimpleNamespace(Search=search)
+'''
+
+def test_failed_write_recorded_as_failed_window(tmp_path):
+    tweets = pd.DataFrame({'date': pd.date_range('2020-01-01', periods=96, freq='h'), 'tweet': 'climate'})
+    # a directory in the way of the temporary shard makes its write fail
+    os.mkdir(tmp_path / 'tweets_2020-01-03.csv.tmp')
+    rows = collect_tweets(FrameBackend(tweets), windows, str(tmp_path), calls_per_second=None, retries=0,
+                          verbose=False)
+    assert sorted(rows.status) == ['done', 'done', 'done', 'failed']
+    assert rows.set_index('until').status['2020-01-03'] == 'failed'
+    assert len(read_manifest(str(tmp_path))) == 4
+
+def test_twint_searches_do_not_share_storage(tmp_path, monkeypatch):
+    (tmp_path / 'twint.py').write_text(fake_twint)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    output_dir = tmp_path / 'shards'
+    output_dir.mkdir()
+    backend = TwintBackend(search='climate', processes=4)
+    try:
+        rows = collect_tweets(backend, windows, str(output_dir), max_workers=4, calls_per_second=None,
+                              verbose=False)
+    finally:
+        backend.close()
+    assert (rows.status == 'done').all()
+    for since, until in windows:
+        shard = pd.read_csv(output_dir / 'tweets_{}.csv'.format(until), index_col=0)
+        assert shard.date.tolist() == [until]
+        # every column twint returns is kept
+        assert shard.columns.tolist() == ['id', 'date', 'tweet', 'username']
+        assert shard.id.tolist() == [int(until.replace('-', ''))]